@@ -101,6 +101,77 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+# "fragments" holds rendered html such as ItemBase.render() output.
+# Swap the backend for redis/memcached in prod, locmem evicts LRU entries
+# past MAX_ENTRIES and anything older than TIMEOUT seconds.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "fragments": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "fragments",
+        "TIMEOUT": 60 * 60 * 24,
+        "OPTIONS": {
+            "MAX_ENTRIES": 5000,
+        },
+    },
+    # resolved ProfileLink uids, kept per process and short lived
+    "links": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "links",
+        "TIMEOUT": 60,
+        "OPTIONS": {
+            "MAX_ENTRIES": 1000,
+        },
+    },
+    # per user connection adjacency, optional, see profile/utils/graph.py
+    "graph": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "graph",
+        "TIMEOUT": 60 * 60,
+        "OPTIONS": {
+            "MAX_ENTRIES": 5000,
+        },
+    },
+}
+
+
+# Buffer ProfileLink view counts in process and write them every MAX_VIEWS
+# views or MAX_SECONDS seconds. Links with a view limit are always written
+# immediately. None writes every view as it happens.
+# PROFILE_LINK_VIEW_BUFFER = {"MAX_VIEWS": 100, "MAX_SECONDS": 30}
+PROFILE_LINK_VIEW_BUFFER = None
+
+# Flag time and view expired ProfileLinks every INTERVAL seconds from a
+# thread in each process. None leaves it to `manage.py expire_links`, e.g. from cron.
+# PROFILE_LINK_SWEEP = {"INTERVAL": 300}
+PROFILE_LINK_SWEEP = None
+
+# Threads per process normalizing uploaded images and generating thumbnails.
+PROFILE_IMAGE_WORKERS = 2
+
+# Uploaded photos and image attachments are rotated upright, scaled to fit
+# MAX_SIZE pixels and re-encoded without metadata after upload. None keeps uploads as sent.
+PROFILE_IMAGE_NORMALIZATION = {
+    "MAX_SIZE": 2048,
+    "FORMAT": "WEBP",
+    "QUALITY": 82,
+    "KEEP_ORIGINAL": False,
+}
+
+# Images attached by url are fetched by WORKERS threads per process and shown
+# from a local copy, see profile/utils/remote.py for the other keys and defaults.
+PROFILE_REMOTE_IMAGES = {
+    "WORKERS": 2,
+    "TIMEOUT": 5,
+    "MAX_BYTES": 5 * 1024 * 1024,
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -37,6 +37,7 @@ urlpatterns = [
         include([
             path('', prof_views.user_content_view, name='content'),
             path('new/', prof_views.add_item, name='add_item'),
+            path('search/', prof_views.search_view, name='search'),
             path(  # for single models like Email or WorkExperience
                 '<slug:model_name>/',
                 include([
@@ -48,11 +49,16 @@ urlpatterns = [
         ]),
     ),
     path('shared/<uuid:uid>/', prof_views.SharedProfileView.as_view(), name='shared_profile'),
+    path('shared/<uuid:uid>/vcf', prof_views.shared_profile_vcard, name='shared_profile_vcard'),
+    path('shared/<uuid:uid>/json', prof_views.shared_profile_json, name='shared_profile_json'),
+    path('qr/<uuid:uid>.svg', prof_views.link_qr, {'kind': 'svg'}, name='link_qr_svg'),
+    path('qr/<uuid:uid>.png', prof_views.link_qr, {'kind': 'png'}, name='link_qr_png'),
     path(
         'connections/',
         include([
             path('', prof_views.ConnectionListView.as_view(), name='connection_list'),
             path('declined/', prof_views.DeclinedListView.as_view(), name='declined_list'),
+            path('vcf/', prof_views.connections_vcard, name='connections_vcard'),
             path('<int:connection_pk>/', prof_views.connection, name='connection'),
             path('<int:request_pk>/accept/', prof_views.connection_accept, name='connection_accept'),
             path('<int:request_pk>/decline/', prof_views.connection_decline, name='connection_decline'),
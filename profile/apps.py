@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ProfileConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "profile"
+
+    def ready(self):
+        from . import signals, tasks
+        signals.connect()
+        tasks.start()
@@ -4,7 +4,5 @@ from profile.models import ConnectionRequest
 def connection_requests(request):
     context_data = dict()
     if request.user.is_authenticated:
-        context_data['connection_request_count'] = ConnectionRequest.outstanding.filter(
-            profile_to__user=request.user,
-        ).count()
+        context_data['connection_request_count'] = ConnectionRequest.outstanding_count(request.user.pk)
     return context_data
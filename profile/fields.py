@@ -1,5 +1,7 @@
-from django.db import models
-from django.core.exceptions import ObjectDoesNotExist
+from collections import defaultdict
+
+from django.db import models, transaction
+from django.db.models.functions import RowNumber
 
 
 class OrderField(models.PositiveIntegerField):
@@ -10,19 +12,107 @@ class OrderField(models.PositiveIntegerField):
     def pre_save(self, model_instance, add):
         if getattr(model_instance, self.attname) is None:
             # no current value
-            try:
-                qs = self.model.objects.all()
-                if self.for_fields:
-                    # filter by objects with the same field values
-                    # for fields in "for_fields"
-                    query = {field: getattr(model_instance, field) for field in self.for_fields}
-                    qs = qs.filter(**query)
-                # get order of last item
-                last_item = qs.latest(self.attname)
-                value = last_item.order + 1
-            except ObjectDoesNotExist:
-                value = 0
-            setattr(model_instance, self.attname, value)
-            return value
-        else:
-            return super(OrderField, self).pre_save(model_instance, add)
+            self.allocate([model_instance])
+        return super(OrderField, self).pre_save(model_instance, add)
+
+    @property
+    def for_attnames(self) -> list[str]:
+        return [self.model._meta.get_field(field).attname for field in self.for_fields or []]
+
+    def allocate(self, instances):
+        """
+        Gives every instance without an order the next free order of its
+        group (objects with the same values for "for_fields"), handing out
+        contiguous ranges in the order the instances are given.
+        The current maximum of every group is read with one query. When
+        for_fields is a single foreign key that query also locks the parent
+        rows, so allocations for the same parent wait until the surrounding
+        transaction commits. Wrap allocation and insert in one atomic block.
+        Other for_fields take no lock, concurrent allocations in the same
+        group can hand out the same order there, so only single foreign key
+        groups (Content, ContentContent) are safe under concurrency.
+        """
+        pending = defaultdict(list)
+        for instance in instances:
+            if getattr(instance, self.attname) is None:
+                key = tuple(getattr(instance, attname) for attname in self.for_attnames)
+                pending[key].append(instance)
+        if not pending:
+            return
+
+        last_orders = self.last_orders(list(pending))
+        for key, group in pending.items():
+            last = last_orders.get(key)
+            start = 0 if last is None else last + 1
+            for offset, instance in enumerate(group):
+                setattr(instance, self.attname, start + offset)
+
+    def last_orders(self, keys: list[tuple]) -> dict[tuple, int]:
+        """highest order in each group, groups without objects are left out"""
+        qs = self.model._default_manager.order_by()
+        attnames = self.for_attnames
+
+        if len(attnames) == 1 and self.model._meta.get_field(self.for_fields[0]).many_to_one:
+            parent = self.model._meta.get_field(self.for_fields[0]).related_model
+            last = (
+                qs.filter(**{attnames[0]: models.OuterRef('pk')})
+                .values(attnames[0])
+                .annotate(last=models.Max(self.attname))
+                .values('last')
+            )
+            with transaction.atomic(savepoint=False):
+                rows = (
+                    parent._base_manager
+                    .select_for_update()
+                    .filter(pk__in=[key[0] for key in keys])
+                    .annotate(last=models.Subquery(last))
+                    .values_list('pk', 'last')
+                )
+                return {(pk,): last for pk, last in rows if last is not None}
+
+        if not attnames:
+            # values() without fields would group by every column
+            last = qs.aggregate(last=models.Max(self.attname))['last']
+            return {} if last is None else {(): last}
+
+        # unlocked, see allocate
+        groups = models.Q()
+        for key in keys:
+            groups |= models.Q(**dict(zip(attnames, key)))
+        rows = qs.filter(groups).values(*attnames).annotate(last=models.Max(self.attname))
+        return {tuple(row[attname] for attname in attnames): row['last'] for row in rows}
+
+    def compact(self, **filters) -> int:
+        """
+        Renumbers orders within each group to 0, 1, 2... keeping their
+        relative order. Returns the number of rows changed.
+        """
+        qs = (
+            self.model._default_manager
+            .filter(**filters)
+            .only('pk', self.attname)
+            .annotate(
+                position=models.Window(
+                    RowNumber(),
+                    partition_by=[models.F(attname) for attname in self.for_attnames] or None,
+                    order_by=[models.F(self.attname).asc(), models.F('pk').asc()],
+                )
+            )
+        )
+        changed = []
+        for obj in qs.iterator(chunk_size=2000):
+            if getattr(obj, self.attname) != obj.position - 1:
+                setattr(obj, self.attname, obj.position - 1)
+                changed.append(obj)
+        with transaction.atomic():
+            self.model._default_manager.bulk_update(changed, [self.attname], batch_size=500)
+        return len(changed)
+
+
+def bulk_create_ordered(model, objs: list, **kwargs) -> list:
+    """bulk_create that allocates every OrderField for the whole batch with one query each"""
+    with transaction.atomic():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, OrderField):
+                field.allocate(objs)
+        return model._default_manager.bulk_create(objs, **kwargs)
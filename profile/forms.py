@@ -12,6 +12,7 @@ from phonenumber_field.formfields import PhoneNumberField
 from djangoyearlessdate.forms import YearlessDateField, YearlessDateSelect
 
 from profile import models
+from profile.utils import images
 
 
 class LoginForm(forms.Form):
@@ -153,11 +154,25 @@ class ProfileSelectContentForm(forms.Form):
             self.fields['model_choice'].label = label
 
 
+class ImportVcardForm(forms.Form):
+    file = forms.FileField(
+        label='vCard file',
+        help_text='A .vcf file, every contact in it is added as a new profile',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.vcf,text/vcard'}),
+    )
+
+
 class ProfileImgEditForm(forms.ModelForm):
     class Meta:
         model = models.Profile
         fields = ('photo',)
 
+    def clean_photo(self):
+        photo = self.cleaned_data['photo']
+        if photo and 'photo' in self.changed_data:
+            images.check_image(photo)
+        return photo
+
 
 class BootstrapModelFormMixin(forms.ModelForm):
     def __init__(self, *args, **kwargs):
@@ -344,6 +359,15 @@ class AttachmentCreateUpdateBaseForm(BootstrapModelFormMixin):
         elif self.initial['model_type'] == models.Attachment.AttachmentTypes.IMAGE:
             self.fields['url'].widget.attrs['placeholder'] = 'https://example.com/image.png'
 
+    def clean_file(self):
+        file = self.cleaned_data['file']
+        if (
+            file and 'file' in self.changed_data
+            and self.initial['model_type'] == models.Attachment.AttachmentTypes.IMAGE
+        ):
+            images.check_image(file)
+        return file
+
 
 def attachment_modelform_factory(mod) -> forms.ModelForm:
     return modelform_factory(
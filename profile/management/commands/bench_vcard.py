@@ -0,0 +1,105 @@
+import time
+from pathlib import Path
+
+import vobject
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from profile.utils import vcard
+
+CORPUS = Path(settings.BASE_DIR) / 'resources' / 'vcard_corpus.vcf'
+
+
+def model_dict_values(model_dict: dict) -> tuple:
+    """comparable field values of a model dict's profile and items"""
+    def values(obj):
+        return tuple(
+            (f.attname, str(getattr(obj, f.attname)))
+            for f in obj._meta.concrete_fields
+            if not f.primary_key and f.attname != 'user_id'
+        )
+    return values(model_dict['profile']), tuple(
+        (type(item).__name__, values(item)) for item in model_dict['items']
+    )
+
+
+def without_vobject_quirks(values):
+    """
+    `model_dict_values` of a card read by vobject with what it gets wrong
+    put right: it keeps the backslash of escapes other than \\n \\, \\; \\\\
+    such as the \\: Google writes in urls
+    """
+    if isinstance(values, tuple):
+        return tuple(without_vobject_quirks(value) for value in values)
+    return values.replace('\\:', ':')
+
+
+class Command(BaseCommand):
+    help = 'Compares the vcard tokenizer to vobject on a corpus and measures cards read per second'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=str(CORPUS),
+            help='vcf file to read, resources/vcard_corpus.vcf by default',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=500,
+            help='Times the file is read for the timings',
+        )
+
+    def handle(self, *args, **options):
+        with open(options['path'], 'rb') as f:
+            blocks = list(vcard.iter_vcard_blocks(f))
+        texts = ['\r\n'.join(raw_lines) + '\r\n' for raw_lines in blocks]
+        self.stdout.write(f'{len(blocks)} cards in {options["path"]}')
+
+        mismatched = fallbacks = tokenizer_only = 0
+        for number, (raw_lines, text) in enumerate(zip(blocks, texts), start=1):
+            try:
+                fast = vcard.tokenize_vcard(raw_lines)
+            except vcard.VcardSyntaxError as e:
+                fallbacks += 1
+                self.stdout.write(f'card {number}: left to vobject, {e}')
+                continue
+            try:
+                slow = vobject.readOne(text)
+            except Exception as e:
+                tokenizer_only += 1
+                self.stdout.write(f'card {number}: only read by the tokenizer, vobject raised {e!r}')
+                continue
+            fast_values = model_dict_values(vcard.component_to_model_dict(fast))
+            slow_values = without_vobject_quirks(model_dict_values(vcard.component_to_model_dict(slow)))
+            if fast_values != slow_values:
+                mismatched += 1
+                self.stdout.write(self.style.WARNING(f'card {number}: differs from vobject'))
+                self.stdout.write(f'  tokenizer: {fast_values}')
+                self.stdout.write(f'  vobject:   {slow_values}')
+
+        self.stdout.write(
+            f'{mismatched} mismatched, {fallbacks} left to vobject, {tokenizer_only} only read by the tokenizer'
+        )
+
+        repeat = options['repeat']
+        cards = len(blocks) * repeat
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for raw_lines in blocks:
+                vcard.read_vcard(raw_lines)
+        fast_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for text in texts:
+                try:
+                    vobject.readOne(text)
+                except Exception:
+                    pass
+        slow_seconds = time.perf_counter() - start
+
+        self.stdout.write(f'tokenizer: {cards / fast_seconds:,.0f} cards/s')
+        self.stdout.write(f'vobject:   {cards / slow_seconds:,.0f} cards/s')
+        self.stdout.write(self.style.SUCCESS(f'{slow_seconds / fast_seconds:.1f}x faster'))
@@ -0,0 +1,43 @@
+from collections import Counter
+
+from django.db import transaction
+from django.core.management.base import BaseCommand
+from django.contrib.contenttypes.models import ContentType
+
+from profile import models
+from profile.signals import item_models
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the ItemCatalog table from every item model'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Rows read and written per query',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        usage = Counter()
+        for model in (models.Content, models.ContentContent):
+            for content_type_id, object_id in (
+                model.objects.order_by().values_list('content_type_id', 'object_id').iterator()
+            ):
+                usage[content_type_id, object_id] += 1
+
+        concrete = [model for model in item_models() if not model._meta.proxy]
+        with transaction.atomic():
+            models.ItemCatalog.objects.all().delete()
+            for model in concrete:
+                ct = ContentType.objects.get_for_model(model)
+                entries = []
+                for item in model._base_manager.order_by().iterator(chunk_size=batch_size):
+                    entries.append(
+                        models.ItemCatalog.entry_for(item, usage_count=usage[ct.pk, item.pk])
+                    )
+                models.ItemCatalog.objects.bulk_create(entries, batch_size=batch_size)
+                self.stdout.write(f'{model._meta.verbose_name_plural}: {len(entries)}')
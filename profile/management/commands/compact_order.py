@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from profile import models
+
+
+class Command(BaseCommand):
+    help = 'Renumbers Content and ContentContent orders so each profile and content is numbered 0, 1, 2...'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profile',
+            type=int,
+            help='Only compact the contents of this profile pk',
+        )
+
+    def handle(self, *args, **options):
+        content_filters = {}
+        subcontent_filters = {}
+        if options['profile']:
+            content_filters['profile'] = options['profile']
+            subcontent_filters['content__profile'] = options['profile']
+
+        for model, filters in (
+            (models.Content, content_filters),
+            (models.ContentContent, subcontent_filters),
+        ):
+            changed = model._meta.get_field('order').compact(**filters)
+            self.stdout.write(f'{model._meta.verbose_name_plural}: renumbered {changed}')
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from profile.tasks import sweep_links
+
+
+class Command(BaseCommand):
+    help = 'Flags profile links past their expiry time or view limit as expired'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--every',
+            type=float,
+            help='Keep running and sweep every this many seconds',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            metrics = sweep_links()
+            self.stdout.write(f'expired {metrics["flipped"]} links in {metrics["seconds"]:.3f}s')
+            if not options['every']:
+                break
+            time.sleep(options['every'])
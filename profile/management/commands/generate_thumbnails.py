@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from profile import models, tasks
+from profile.utils.workers import WorkerPool
+
+
+class Command(BaseCommand):
+    help = 'Generates the thumbnails of every profile photo'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Photos processed at once',
+        )
+
+    def handle(self, *args, **options):
+        names = (
+            models.Profile.objects
+            .exclude(photo='')
+            .order_by('photo')
+            .values_list('photo', flat=True)
+            .distinct()
+        )
+        pool = WorkerPool(options['workers'], name='thumbnail-backfill')
+        futures = [pool.submit(tasks.generate_thumbnails, name) for name in names.iterator()]
+        failed = 0
+        for count, future in enumerate(futures, start=1):
+            # failures are logged by the pool and return None
+            if future.result() is None:
+                failed += 1
+            if count % 100 == 0:
+                self.stdout.write(f'{count} of {len(futures)} photos')
+        pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(
+            f'generated thumbnails for {len(futures) - failed} of {len(futures)} photos'
+        ))
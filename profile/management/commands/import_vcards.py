@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from profile.utils import consts, vcard
+
+
+class Command(BaseCommand):
+    help = 'Imports every card of a vcf file as a profile of a user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path', help='vcf file to import')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=consts.VCARD_IMPORT_CHUNK_SIZE,
+            help='Valid cards written per transaction',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options['username'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'no user {options["username"]}')
+
+        def progress(run):
+            self.stdout.write(f'read {run.read} cards, imported {run.imported}, {len(run.errors)} errors')
+
+        with open(options['path'], 'rb') as f:
+            run = vcard.VcardImport(user, chunk_size=options['chunk_size']).run(f, progress=progress)
+
+        for number, message in run.errors:
+            self.stderr.write(f'card {number}: {message}')
+        self.stdout.write(self.style.SUCCESS(f'imported {run.imported} of {run.read} cards'))
@@ -0,0 +1,63 @@
+import operator
+from functools import reduce
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db.models import Case, F, Q, Value, When
+
+from profile.models import PostBase
+from profile.utils import markup
+
+
+class Command(BaseCommand):
+    help = 'Renders the markdown description of every post item into description_html'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Render every description, not only those without html yet',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model in apps.get_app_config('profile').get_models():
+            if not issubclass(model, PostBase) or model._meta.proxy:
+                continue
+            qs = model.objects.exclude(description='').order_by('pk')
+            if not options['all']:
+                qs = qs.filter(description_html='')
+            rendered = 0
+            last_pk = None
+            while True:
+                batch = list(
+                    (qs if last_pk is None else qs.filter(pk__gt=last_pk))
+                    .values_list('pk', 'description')[:batch_size]
+                )
+                if not batch:
+                    break
+                last_pk = batch[-1][0]
+                rendered += self.write_batch(model, batch)
+            self.stdout.write(f'{model._meta.verbose_name_plural}: rendered {rendered}')
+
+    @staticmethod
+    def write_batch(model, batch: list[tuple[int, str]]) -> int:
+        """
+        Stores the html of (pk, description) rows with one UPDATE and returns
+        the number written. Rows whose description changed since it was read
+        are left alone, saving the edit rendered them already.
+        """
+        html = {pk: markup.render_markdown(description) for pk, description in batch}
+        unchanged = reduce(operator.or_, (Q(pk=pk, description=description) for pk, description in batch))
+        return model.objects.filter(unchanged).update(
+            description_html=Case(
+                *[When(pk=pk, then=Value(value)) for pk, value in html.items()],
+                default=F('description_html'),
+                output_field=model._meta.get_field('description_html'),
+            ),
+        )
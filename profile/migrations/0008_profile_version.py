@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profile', '0007_alter_profilelink_options_alter_profilelink_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:17
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profile', '0008_profile_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profilelink',
+            name='uid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='profilelink',
+            index=models.Index(condition=models.Q(('is_expired', False)), fields=['uid'], name='profilelink_active_uid_idx'),
+        ),
+    ]
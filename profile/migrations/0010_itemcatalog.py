@@ -0,0 +1,40 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('profile', '0009_profilelink_uid_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemCatalog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('label', models.CharField(blank=True, max_length=200)),
+                ('category', models.CharField(max_length=50)),
+                ('updated', models.DateTimeField()),
+                ('usage_count', models.PositiveIntegerField(default=0)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='catalog_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'catalog entry',
+                'verbose_name_plural': 'catalog entries',
+                'ordering': ['-updated'],
+                'indexes': [models.Index(fields=['user', '-updated'], name='itemcatalog_user_updated_idx'), models.Index(fields=['user', 'category', '-updated'], name='itemcatalog_user_cat_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='itemcatalog',
+            constraint=models.UniqueConstraint(fields=('content_type', 'object_id'), name='itemcatalog_item_unique'),
+        ),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:25
+
+from django.db import migrations, models
+
+
+POSTGRES_FORWARDS = [
+    """
+    ALTER TABLE profile_itemcatalog ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english'::regconfig, coalesce(search_a, '')), 'A')
+        || setweight(to_tsvector('english'::regconfig, coalesce(search_b, '')), 'B')
+        || setweight(to_tsvector('english'::regconfig, coalesce(search_c, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX itemcatalog_search_idx ON profile_itemcatalog USING gin (search_vector)",
+]
+POSTGRES_BACKWARDS = [
+    "DROP INDEX IF EXISTS itemcatalog_search_idx",
+    "ALTER TABLE profile_itemcatalog DROP COLUMN IF EXISTS search_vector",
+]
+
+# external content table, the triggers keep it in step with profile_itemcatalog
+# note sqlite table rebuilds (some AlterField migrations) drop the triggers
+SQLITE_FORWARDS = [
+    """
+    CREATE VIRTUAL TABLE profile_itemcatalog_fts USING fts5(
+        search_a, search_b, search_c,
+        content='profile_itemcatalog', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER profile_itemcatalog_fts_ai AFTER INSERT ON profile_itemcatalog BEGIN
+        INSERT INTO profile_itemcatalog_fts(rowid, search_a, search_b, search_c)
+        VALUES (new.id, new.search_a, new.search_b, new.search_c);
+    END
+    """,
+    """
+    CREATE TRIGGER profile_itemcatalog_fts_ad AFTER DELETE ON profile_itemcatalog BEGIN
+        INSERT INTO profile_itemcatalog_fts(profile_itemcatalog_fts, rowid, search_a, search_b, search_c)
+        VALUES ('delete', old.id, old.search_a, old.search_b, old.search_c);
+    END
+    """,
+    """
+    CREATE TRIGGER profile_itemcatalog_fts_au AFTER UPDATE ON profile_itemcatalog BEGIN
+        INSERT INTO profile_itemcatalog_fts(profile_itemcatalog_fts, rowid, search_a, search_b, search_c)
+        VALUES ('delete', old.id, old.search_a, old.search_b, old.search_c);
+        INSERT INTO profile_itemcatalog_fts(rowid, search_a, search_b, search_c)
+        VALUES (new.id, new.search_a, new.search_b, new.search_c);
+    END
+    """,
+    "INSERT INTO profile_itemcatalog_fts(profile_itemcatalog_fts) VALUES ('rebuild')",
+]
+SQLITE_BACKWARDS = [
+    "DROP TRIGGER IF EXISTS profile_itemcatalog_fts_ai",
+    "DROP TRIGGER IF EXISTS profile_itemcatalog_fts_ad",
+    "DROP TRIGGER IF EXISTS profile_itemcatalog_fts_au",
+    "DROP TABLE IF EXISTS profile_itemcatalog_fts",
+]
+
+
+def run_for_vendor(postgres, sqlite):
+    def run(apps, schema_editor):
+        statements = {
+            'postgresql': postgres,
+            'sqlite': sqlite,
+        }.get(schema_editor.connection.vendor, [])
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profile', '0010_itemcatalog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemcatalog',
+            name='search_a',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='itemcatalog',
+            name='search_b',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='itemcatalog',
+            name='search_c',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(
+            run_for_vendor(POSTGRES_FORWARDS, SQLITE_FORWARDS),
+            run_for_vendor(POSTGRES_BACKWARDS, SQLITE_BACKWARDS),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profile', '0011_itemcatalog_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profilelink',
+            index=models.Index(condition=models.Q(('expires__isnull', False), ('is_expired', False)), fields=['expires'], name='profilelink_due_expires_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profilelink',
+            index=models.Index(condition=models.Q(('is_expired', False), ('max_views__isnull', False)), fields=['id'], name='profilelink_view_limited_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+POST_MODELS = (
+    'award',
+    'certificate',
+    'education',
+    'license',
+    'membership',
+    'patent',
+    'project',
+    'publishedwork',
+    'researchproject',
+    'volunteerwork',
+    'workexperience',
+)
+
+
+def clear_description_html(apps, schema_editor):
+    # html rendered before urls were checked after decoding character references
+    # may hold javascript: links, the template renders these again until
+    # render_descriptions fills them
+    for model_name in POST_MODELS:
+        apps.get_model('profile', model_name).objects.exclude(description_html='').update(description_html='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profile', '0013_postbase_description_html'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_description_html, migrations.RunPython.noop),
+    ]
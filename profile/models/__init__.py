@@ -4,6 +4,7 @@ from .profile import (
     Content,
     ContentContent,
     ItemBase,
+    ItemCatalog,
     ProfileLink,
     Connection,
     ConnectionRequest,
@@ -1,6 +1,7 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from ..utils import markup
 from . import profile as profile_models
 
 
@@ -23,6 +24,11 @@ class PostBase(profile_models.ItemBase):
         blank=True,
         verbose_name='external link',
     )
+    # description rendered by markup.render_markdown, kept current by save
+    description_html = models.TextField(
+        blank=True,
+        editable=False,
+    )
 
     class Meta(profile_models.ItemBase.Meta):
         abstract = True
@@ -31,6 +37,24 @@ class PostBase(profile_models.ItemBase):
     def __str__(self):
         return f'{self.label}{" - " + str(self.date) if self.date else ""}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # description as stored, lets save skip rendering when it's unchanged
+        if 'description' in field_names:
+            instance._loaded_description = values[field_names.index('description')]
+        return instance
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'description' in update_fields:
+            if self._state.adding or getattr(self, '_loaded_description', None) != self.description:
+                self.description_html = markup.render_markdown(self.description)
+                if update_fields is not None:
+                    kwargs['update_fields'] = {*update_fields, 'description_html'}
+        super().save(*args, **kwargs)
+        self._loaded_description = self.description
+
 
 class OrgBase(PostBase):
     organization = models.CharField(
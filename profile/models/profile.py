@@ -1,18 +1,25 @@
 import uuid
 import inspect
+import functools
+from collections import defaultdict
 
 from django.apps import apps
-from django.db import models
+from django.db import models, transaction
 from django.urls import reverse
 from django.conf import settings
+from django.core.cache import caches
 from django.utils import timezone
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
 from django.contrib.sites.models import Site
 from django.template.loader import render_to_string
 from django.utils.translation import gettext_lazy as _
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 
-from ..utils import consts
+from ..utils import consts, library
+from ..utils.cache import render_cache, LINK_CACHE
+from ..utils.counters import CountBuffer
 from ..fields import OrderField
 
 
@@ -74,6 +81,9 @@ class Profile(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    # bumped whenever the profile, its contents or their items change
+    version = models.PositiveIntegerField(default=0, editable=False)
+
     class Meta:
         verbose_name = 'profile'
         verbose_name_plural = 'profiles'
@@ -88,7 +98,18 @@ class Profile(models.Model):
             )
             share_link.save()
         else:
-            super().save()
+            # version is only written by bump_versions, a stale copy mustn't roll it back
+            if not self._state.adding:
+                update_fields = kwargs.get('update_fields')
+                if update_fields is None and not args:
+                    deferred = self.get_deferred_fields()
+                    update_fields = [
+                        f.name for f in self._meta.concrete_fields
+                        if not f.primary_key and f.attname not in deferred
+                    ]
+                if update_fields is not None:
+                    kwargs['update_fields'] = [name for name in update_fields if name != 'version']
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f'{self.user.username}\'s {self.title} Profile'
@@ -105,6 +126,51 @@ class Profile(models.Model):
              f'{", " + self.suffix if self.suffix else ""}')
         return s
 
+    @classmethod
+    def bump_versions(cls, *args, **kwargs) -> int:
+        """increments the version of every profile matching the filters in one UPDATE"""
+        return cls.objects.filter(*args, **kwargs).update(version=models.F('version') + 1)
+
+    def load_contents(self) -> list:
+        """
+        Returns the profile's ordered contents with their subcontents and items loaded.
+        Contents and subcontents are fetched with one query each, then the
+        items they point to are grouped by content type and fetched with one
+        query per type, so the query count doesn't grow with the amount of content.
+        """
+        contents = list(self.contents.prefetch_related('subcontents'))
+        rows = contents + [sc for c in contents for sc in c.subcontents.all()]
+
+        object_ids = defaultdict(set)
+        for row in rows:
+            object_ids[row.content_type_id].add(row.object_id)
+
+        items = {}
+        for content_type_id, ids in object_ids.items():
+            model = ContentType.objects.get_for_id(content_type_id).model_class()
+            if model is None:
+                # stale content type
+                continue
+            related = [
+                f.name for f in model._meta.concrete_fields
+                if f.many_to_one and f.name != 'user'
+            ]
+            qs = model._base_manager.filter(pk__in=ids).select_related(*related)
+            for obj in qs:
+                items[content_type_id, obj.pk] = obj
+
+        for row in rows:
+            item = items.get((row.content_type_id, row.object_id))
+            if item is not None:
+                # same as assigning row.item but without touching the fk columns
+                row._meta.get_field('item').set_cached_value(row, item)
+        return contents
+
+    @cached_property
+    def content_list(self) -> list:
+        """contents loaded by `load_contents` once per instance for use in templates"""
+        return self.load_contents()
+
 
 class Content(models.Model):
     profile = models.ForeignKey(
@@ -136,6 +202,11 @@ class Content(models.Model):
     def __str__(self):
         return str(self.item)
 
+    def save(self, *args, **kwargs):
+        # hold the lock taken by OrderField.allocate until the row is written
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class ContentContent(models.Model):
     """Relationship from a profile content item to a sub-item"""
@@ -162,6 +233,11 @@ class ContentContent(models.Model):
     def __str__(self):
         return str(self.item)
 
+    def save(self, *args, **kwargs):
+        # hold the lock taken by OrderField.allocate until the row is written
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class ItemBase(models.Model):
     user = models.ForeignKey(
@@ -176,20 +252,43 @@ class ItemBase(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    # search weight of text fields, A ranks highest
+    # other editable text fields without choices are weighted C
+    search_weights = {
+        'label': 'A',
+        'organization': 'B',
+        'degree_type': 'B',
+        'location': 'B',
+        'contributors': 'B',
+        'source': 'B',
+        'affiliated_institutions': 'B',
+        'funding_source': 'B',
+        'email_address': 'B',
+        'city': 'B',
+    }
+
     class Meta:
         abstract = True
 
+    @classmethod
+    @functools.cache
+    def render_template_names(cls) -> list[str]:
+        cls_name = cls.__name__
+        parent_cls_name = inspect.getmro(cls)[1].__name__
+        grandparent_cls_name = inspect.getmro(cls)[2].__name__
+        return [
+            f'profile/partials/models/{cls_name.lower()}_render.html',
+            f'profile/partials/models/{parent_cls_name.lower()}_render.html',
+            f'profile/partials/models/{grandparent_cls_name.lower()}_render.html',
+            f'profile/partials/models/model_render.html',
+        ]
+
     def render(self):
-        cls_name = self.__class__.__name__
-        parent_cls_name = inspect.getmro(self.__class__)[1].__name__
-        grandparent_cls_name = inspect.getmro(self.__class__)[2].__name__
+        return render_cache.get_or_render(self, self.render_uncached)
+
+    def render_uncached(self):
         return render_to_string(
-            [
-                f'profile/partials/models/{cls_name.lower()}_render.html',
-                f'profile/partials/models/{parent_cls_name.lower()}_render.html',
-                f'profile/partials/models/{grandparent_cls_name.lower()}_render.html',
-                f'profile/partials/models/model_render.html',
-            ],
+            self.render_template_names(),
             {'object': self}
         )
 
@@ -197,6 +296,123 @@ class ItemBase(models.Model):
     def model_name(self):
         return self.__class__.__name__
 
+    def search_text(self) -> dict[str, str]:
+        """the item's text fields joined per search weight"""
+        text = {'A': [], 'B': [], 'C': []}
+        for field in self._meta.concrete_fields:
+            if not isinstance(field, (models.CharField, models.TextField)) or field.choices or not field.editable:
+                continue
+            value = field.value_from_object(self)
+            if value:
+                text[self.search_weights.get(field.name, 'C')].append(str(value))
+        return {weight: ' '.join(values) for weight, values in text.items()}
+
+
+class ItemCatalog(models.Model):
+    """
+    One row per item across all ItemBase tables, kept in sync by signals
+    (see signals.py) and rebuilt with the build_item_catalog command.
+    content_type is the concrete model's, as on Content, and usage_count
+    is the number of Content and ContentContent rows pointing at the item.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='catalog_entries',
+        on_delete=models.CASCADE,
+    )
+    content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.CASCADE,
+    )
+    object_id = models.PositiveIntegerField()
+    item = GenericForeignKey('content_type', 'object_id')
+    # as long as the longest item label (PostBase)
+    label = models.CharField(max_length=200, blank=True)
+    category = models.CharField(max_length=50)
+    updated = models.DateTimeField()
+    usage_count = models.PositiveIntegerField(default=0)
+    # weighted search text, indexed by a tsvector column and GIN index on
+    # PostgreSQL or an FTS5 table on SQLite, see migration 0011 and utils/search.py
+    search_a = models.TextField(blank=True, editable=False)
+    search_b = models.TextField(blank=True, editable=False)
+    search_c = models.TextField(blank=True, editable=False)
+
+    class Meta:
+        ordering = ['-updated']
+        verbose_name = 'catalog entry'
+        verbose_name_plural = 'catalog entries'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['content_type', 'object_id'],
+                name='itemcatalog_item_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-updated'], name='itemcatalog_user_updated_idx'),
+            models.Index(fields=['user', 'category', '-updated'], name='itemcatalog_user_cat_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.category}: {self.label}'
+
+    @classmethod
+    def entry_for(cls, item, usage_count: int = 0):
+        text = item.search_text()
+        return cls(
+            user_id=item.user_id,
+            content_type=ContentType.objects.get_for_model(item),
+            object_id=item.pk,
+            label=item.label,
+            category=library.item_category(type(item)),
+            updated=item.updated,
+            usage_count=usage_count,
+            search_a=text['A'],
+            search_b=text['B'],
+            search_c=text['C'],
+        )
+
+    @classmethod
+    def sync(cls, entries: list, with_usage: bool = False, batch_size: int = 500) -> list:
+        """
+        Inserts entries or updates the existing rows for the same items,
+        one INSERT ... ON CONFLICT per batch.
+        usage_count of existing rows is only overwritten when `with_usage` is set.
+        """
+        update_fields = ['user', 'label', 'category', 'updated', 'search_a', 'search_b', 'search_c']
+        if with_usage:
+            update_fields.append('usage_count')
+        return cls.objects.bulk_create(
+            entries,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['content_type', 'object_id'],
+            update_fields=update_fields,
+        )
+
+    @classmethod
+    def refresh_usage(cls, content_type_id: int, object_ids) -> int:
+        """recounts usage_count of the given items with one UPDATE"""
+        def count(model):
+            return Coalesce(
+                models.Subquery(
+                    model.objects
+                    .filter(
+                        content_type_id=models.OuterRef('content_type_id'),
+                        object_id=models.OuterRef('object_id'),
+                    )
+                    .order_by()
+                    .values('object_id')
+                    .annotate(n=models.Count('pk'))
+                    .values('n')
+                ),
+                0,
+            )
+
+        return cls.objects.filter(
+            content_type_id=content_type_id,
+            object_id__in=object_ids,
+        ).update(usage_count=count(Content) + count(ContentContent))
+
 
 class ActiveManager(models.Manager):
     def get_queryset(self):
@@ -212,6 +428,7 @@ class ProfileLink(models.Model):
     uid = models.UUIDField(
         default=uuid.uuid4,
         editable=False,
+        unique=True,
     )
     profile = models.ForeignKey(
         Profile,
@@ -246,17 +463,120 @@ class ProfileLink(models.Model):
         ordering = ['-created']
         verbose_name = 'profile link'
         verbose_name_plural = 'profile links'
+        indexes = [
+            models.Index(
+                fields=['uid'],
+                condition=models.Q(is_expired=False),
+                name='profilelink_active_uid_idx',
+            ),
+            # the two halves of the expire_due sweep
+            models.Index(
+                fields=['expires'],
+                condition=models.Q(is_expired=False, expires__isnull=False),
+                name='profilelink_due_expires_idx',
+            ),
+            models.Index(
+                fields=['id'],
+                condition=models.Q(is_expired=False, max_views__isnull=False),
+                name='profilelink_view_limited_idx',
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         self.is_expired = self.calculate_expired
         super().save(*args, **kwargs)
 
+    @staticmethod
+    def cache_key(uid) -> str:
+        return f'link:{uid}'
+
+    @classmethod
+    def resolve(cls, uid):
+        """
+        Returns the active link for a shared uid or None.
+        Resolved links are kept in the links cache for a short time so
+        repeat hits skip the database. Time expiry is checked against the
+        cached value on every call and links with max_views are always
+        looked up since their view count changes on each hit.
+        The returned link only has its id, uid, profile, expires and
+        max_views fields loaded.
+        """
+        cache = caches[LINK_CACHE]
+        key = cls.cache_key(uid)
+        entry = cache.get(key)
+        if entry is None:
+            entry = (
+                cls.objects
+                .filter(uid=uid, is_expired=False)
+                .values_list('pk', 'profile_id', 'expires', 'max_views')
+                .first()
+            )
+            if entry is None:
+                return None
+            if entry[3] is None:
+                cache.set(key, entry)
+        pk, profile_id, expires, max_views = entry
+        if expires is not None and timezone.now() >= expires:
+            return None
+        return cls.from_db(
+            None,
+            ['id', 'uid', 'profile_id', 'expires', 'max_views'],
+            (pk, uid, profile_id, expires, max_views),
+        )
+
+    @classmethod
+    def forget(cls, uid):
+        """drops a resolved link from the links cache"""
+        caches[LINK_CACHE].delete(cls.cache_key(uid))
+
     def get_shareable_url(self):
         return f"{Site.objects.get_current()}{reverse('shared_profile', kwargs={'uid': self.uid})}"
 
     def record_view(self):
-        self.views += 1
-        self.save()
+        """
+        Counts a view without rewriting the row.
+        Links with max_views are always written straight away so they
+        expire on time, others go through the view buffer when one is configured.
+        """
+        buffer = link_view_buffer()
+        if buffer is not None and self.max_views is None:
+            buffer.add(self.pk)
+        else:
+            ProfileLink.add_views({self.pk: 1})
+        if 'views' not in self.get_deferred_fields():
+            self.views += 1
+
+    @staticmethod
+    def add_views(counts: dict[int, int]):
+        """
+        Adds view counts to links by pk with one UPDATE per link that also
+        sets is_expired when the new count reaches max_views.
+        """
+        now = timezone.now()
+        for pk, count in counts.items():
+            ProfileLink.objects.filter(pk=pk).update(
+                views=models.F('views') + count,
+                last_viewed=now,
+                is_expired=models.Case(
+                    models.When(
+                        models.Q(max_views__lte=models.F('views') + count) | models.Q(expires__lte=now),
+                        then=models.Value(True),
+                    ),
+                    default=models.F('is_expired'),
+                ),
+            )
+
+    @classmethod
+    def expire_due(cls, now=None) -> int:
+        """
+        Flags every active link past its expiry time or view limit with one
+        UPDATE, returns the number of links flagged.
+        """
+        now = now or timezone.now()
+        return cls.objects.filter(is_expired=False).filter(
+            models.Q(expires__lte=now)
+            | models.Q(max_views__isnull=False, views__gte=models.F('max_views'))
+        ).update(is_expired=True)
 
     @property
     def views_expired(self):
@@ -271,6 +591,24 @@ class ProfileLink(models.Model):
         return self.views_expired or self.time_expired
 
 
+_link_view_buffer = None
+
+
+def link_view_buffer() -> CountBuffer | None:
+    """the process wide ProfileLink view buffer or None if settings.PROFILE_LINK_VIEW_BUFFER isn't set"""
+    global _link_view_buffer
+    config = getattr(settings, 'PROFILE_LINK_VIEW_BUFFER', None)
+    if not config:
+        return None
+    if _link_view_buffer is None:
+        _link_view_buffer = CountBuffer(
+            write=ProfileLink.add_views,
+            max_pending=config.get('MAX_VIEWS', 100),
+            max_age=config.get('MAX_SECONDS', 30),
+        )
+    return _link_view_buffer
+
+
 class Connection(models.Model):
     profile_from = models.ForeignKey(
         Profile,
@@ -356,6 +694,47 @@ class ConnectionRequest(models.Model):
     def __str__(self):
         return f'{self.profile_from} requested to follow {self.profile_to}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # status as stored, lets the signals tell what a save changed
+        if 'status' in field_names:
+            instance._loaded_status = values[field_names.index('status')]
+        return instance
+
+    @staticmethod
+    def outstanding_count_key(user_id: int) -> str:
+        return f'connection_requests:outstanding:{user_id}'
+
+    @classmethod
+    def outstanding_count(cls, user_id: int) -> int:
+        """
+        Number of outstanding requests to the user's profiles.
+        Kept in the default cache, adjusted by signals and counted again
+        after a cache miss.
+        """
+        key = cls.outstanding_count_key(user_id)
+        count = caches['default'].get(key)
+        if count is None:
+            count = cls.outstanding.filter(profile_to__user_id=user_id).count()
+            # add so a count adjusted meanwhile isn't overwritten
+            caches['default'].add(key, count)
+        return count
+
+    @classmethod
+    def forget_outstanding_count(cls, user_id: int):
+        caches['default'].delete(cls.outstanding_count_key(user_id))
+
+    @classmethod
+    def adjust_outstanding_count(cls, user_id: int, delta: int):
+        if not delta:
+            return
+        try:
+            caches['default'].incr(cls.outstanding_count_key(user_id), delta)
+        except ValueError:
+            # not cached, counted on next read
+            pass
+
     def accept(self):
         self.status = RequestStatus.ACCEPTED
         self.save()
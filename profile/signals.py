@@ -0,0 +1,186 @@
+import operator
+import threading
+from functools import reduce
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.contrib.contenttypes.models import ContentType
+
+from .models import (
+    ItemBase, ItemCatalog, Profile, Content, ContentContent, ProfileLink, Connection, ConnectionRequest,
+)
+from .models.profile import RequestStatus
+from .utils import graph
+from .utils.cache import render_cache
+
+
+_batch = threading.local()
+
+
+def item_models() -> list:
+    """every concrete and proxy ItemBase subclass in the app"""
+    return [
+        model for model in apps.get_app_config('profile').get_models()
+        if issubclass(model, ItemBase)
+    ]
+
+
+def batching() -> bool:
+    return getattr(_batch, 'versions', None) is not None
+
+
+def bump_versions(*args, **kwargs):
+    """Profile.bump_versions, or queued until the enclosing batched_updates() exits"""
+    if batching():
+        _batch.versions.append(Q(*args, **kwargs))
+    else:
+        Profile.bump_versions(*args, **kwargs)
+
+
+def refresh_usage(content_type_id: int, object_ids):
+    """ItemCatalog.refresh_usage, or queued until the enclosing batched_updates() exits"""
+    if batching():
+        _batch.usage[content_type_id].update(object_ids)
+    else:
+        ItemCatalog.refresh_usage(content_type_id, object_ids)
+
+
+@contextmanager
+def batched_updates():
+    """
+    Merges the version bumps and catalog usage recounts of every save
+    and delete inside the block into one UPDATE for versions and one per
+    content type for usage, issued when the block exits without an error.
+    """
+    if batching():
+        yield
+        return
+    _batch.versions = []
+    _batch.usage = defaultdict(set)
+    try:
+        yield
+        versions, usage = _batch.versions, _batch.usage
+    finally:
+        _batch.versions = _batch.usage = None
+    if versions:
+        Profile.bump_versions(reduce(operator.or_, versions))
+    for content_type_id, object_ids in usage.items():
+        ItemCatalog.refresh_usage(content_type_id, object_ids)
+
+
+def item_changed(sender, instance, **kwargs):
+    render_cache.invalidate(instance)
+    ct = ContentType.objects.get_for_model(instance)
+    bump_versions(
+        Q(content__content_type=ct, content__object_id=instance.pk)
+        | Q(content__contentcontent__content_type=ct, content__contentcontent__object_id=instance.pk)
+    )
+
+
+def profile_changed(sender, instance, **kwargs):
+    bump_versions(pk=instance.pk)
+
+
+def content_changed(sender, instance, **kwargs):
+    bump_versions(pk=instance.profile_id)
+
+
+def subcontent_changed(sender, instance, **kwargs):
+    bump_versions(content__pk=instance.content_id)
+
+
+def catalog_item_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        # loaddata, build_item_catalog picks these up
+        return
+    ItemCatalog.sync([ItemCatalog.entry_for(instance)])
+
+
+def catalog_item_deleted(sender, instance, **kwargs):
+    ItemCatalog.objects.filter(
+        content_type=ContentType.objects.get_for_model(instance),
+        object_id=instance.pk,
+    ).delete()
+
+
+def usage_changed(sender, instance, created=None, **kwargs):
+    if created is False:
+        # only adding and removing rows changes usage
+        return
+    refresh_usage(instance.content_type_id, [instance.object_id])
+
+
+def link_changed(sender, instance, **kwargs):
+    ProfileLink.forget(instance.uid)
+
+
+def forget_graph(profile_ids):
+    """drops the cached adjacency of the users owning `profile_ids`"""
+    if graph.graph_cache() is None or not profile_ids:
+        return
+    graph.forget(
+        Profile.objects.filter(pk__in=profile_ids).values_list('user_id', flat=True).distinct()
+    )
+
+
+def connection_changed(sender, instance, **kwargs):
+    forget_graph([instance.profile_from_id, instance.profile_to_id])
+
+
+def connections_changed(sender, instance, action, pk_set, **kwargs):
+    # Profile.connections.add() and remove() bulk write Connection rows without post_save
+    if action in ('post_add', 'post_remove'):
+        forget_graph({instance.pk, *pk_set})
+    elif action == 'pre_clear':
+        forget_graph({instance.pk, *instance.connections.values_list('pk', flat=True)})
+
+
+def request_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    was_outstanding = (
+        False if created
+        else getattr(instance, '_loaded_status', None) == RequestStatus.OUTSTANDING
+    )
+    if not created and not hasattr(instance, '_loaded_status'):
+        # previous status unknown, count again on next read
+        ConnectionRequest.forget_outstanding_count(instance.profile_to.user_id)
+    else:
+        is_outstanding = instance.status == RequestStatus.OUTSTANDING
+        ConnectionRequest.adjust_outstanding_count(
+            instance.profile_to.user_id, int(is_outstanding) - int(was_outstanding),
+        )
+    instance._loaded_status = instance.status
+
+
+def request_deleted(sender, instance, **kwargs):
+    if getattr(instance, '_loaded_status', instance.status) == RequestStatus.OUTSTANDING:
+        ConnectionRequest.adjust_outstanding_count(instance.profile_to.user_id, -1)
+
+
+def connect():
+    for model in item_models():
+        post_save.connect(item_changed, sender=model, dispatch_uid=f'item_changed_save_{model.__name__}')
+        post_delete.connect(item_changed, sender=model, dispatch_uid=f'item_changed_delete_{model.__name__}')
+        post_save.connect(catalog_item_saved, sender=model, dispatch_uid=f'catalog_item_saved_{model.__name__}')
+        post_delete.connect(catalog_item_deleted, sender=model, dispatch_uid=f'catalog_item_deleted_{model.__name__}')
+
+    post_save.connect(profile_changed, sender=Profile, dispatch_uid='profile_changed_save')
+    for model, receiver in ((Content, content_changed), (ContentContent, subcontent_changed)):
+        post_save.connect(receiver, sender=model, dispatch_uid=f'{receiver.__name__}_save')
+        post_delete.connect(receiver, sender=model, dispatch_uid=f'{receiver.__name__}_delete')
+        post_save.connect(usage_changed, sender=model, dispatch_uid=f'usage_changed_save_{model.__name__}')
+        post_delete.connect(usage_changed, sender=model, dispatch_uid=f'usage_changed_delete_{model.__name__}')
+
+    post_save.connect(link_changed, sender=ProfileLink, dispatch_uid='link_changed_save')
+    post_delete.connect(link_changed, sender=ProfileLink, dispatch_uid='link_changed_delete')
+
+    post_save.connect(connection_changed, sender=Connection, dispatch_uid='connection_changed_save')
+    post_delete.connect(connection_changed, sender=Connection, dispatch_uid='connection_changed_delete')
+    m2m_changed.connect(connections_changed, sender=Profile.connections.through, dispatch_uid='connections_changed')
+
+    post_save.connect(request_saved, sender=ConnectionRequest, dispatch_uid='request_saved')
+    post_delete.connect(request_deleted, sender=ConnectionRequest, dispatch_uid='request_deleted')
@@ -0,0 +1,261 @@
+import time
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.core.files.base import ContentFile
+from sorl.thumbnail import get_thumbnail, delete as delete_image
+
+from .models import Profile, ProfileLink, Attachment
+from .utils import consts, images, remote
+from .utils.scheduler import PeriodicTask
+from .utils.workers import WorkerPool
+
+logger = logging.getLogger(__name__)
+
+_link_sweeper = None
+
+image_pool = WorkerPool(getattr(settings, 'PROFILE_IMAGE_WORKERS', 2), name='profile-images')
+remote_pool = WorkerPool(remote.remote_images_config()['WORKERS'], name='profile-remote-images')
+# photo names and remote image urls queued and not yet done
+_pending_thumbnails = set()
+_pending_remote = set()
+_pending_lock = threading.Lock()
+# remote image urls waiting for a retry, with its timer
+_remote_retries = {}
+
+
+def sweep_links() -> dict:
+    """expires due ProfileLinks, returns the number flipped and the seconds it took"""
+    started = time.monotonic()
+    flipped = ProfileLink.expire_due()
+    metrics = {'flipped': flipped, 'seconds': time.monotonic() - started}
+    logger.info('expired %(flipped)d profile links in %(seconds).3fs', metrics)
+    return metrics
+
+
+def generate_thumbnails(photo_name: str) -> dict:
+    """
+    generates every size in consts.PROFILE_PHOTO_THUMBNAIL_SIZES for a
+    photo, returns the count and the seconds it took
+    """
+    started = time.monotonic()
+    try:
+        for geometry in consts.PROFILE_PHOTO_THUMBNAIL_SIZES:
+            get_thumbnail(photo_name, geometry, **consts.PROFILE_PHOTO_THUMBNAIL_OPTIONS)
+    finally:
+        with _pending_lock:
+            _pending_thumbnails.discard(photo_name)
+    metrics = {'generated': len(consts.PROFILE_PHOTO_THUMBNAIL_SIZES), 'seconds': time.monotonic() - started}
+    logger.info('generated %(generated)d thumbnails of %(photo)s in %(seconds).3fs', {**metrics, 'photo': photo_name})
+    return metrics
+
+
+def enqueue_thumbnails(photo_name: str):
+    """
+    generates a photo's thumbnails on image_pool once the current
+    transaction commits, photos already queued are skipped
+    """
+    if not photo_name:
+        return
+
+    def submit():
+        if _claim_thumbnails(photo_name):
+            image_pool.submit(generate_thumbnails, photo_name)
+
+    transaction.on_commit(submit)
+
+
+def _claim_thumbnails(photo_name: str) -> bool:
+    """marks a photo's thumbnails as queued, False when they already are"""
+    with _pending_lock:
+        if photo_name in _pending_thumbnails:
+            return False
+        _pending_thumbnails.add(photo_name)
+        return True
+
+
+def normalize_upload(model, pk, field_name: str, name: str, on_stored=None) -> dict | None:
+    """
+    Replaces an uploaded image with its images.normalize version, see
+    settings.PROFILE_IMAGE_NORMALIZATION. Nothing changes when the field
+    no longer holds `name`. Returns the new name and the bytes saved.
+    `on_stored` is called with the new name before the field is set to it.
+    """
+    config = images.normalization_config()
+    if config is None:
+        return None
+    started = time.monotonic()
+    field = model._meta.get_field(field_name)
+    storage = field.storage
+    if not model._base_manager.filter(pk=pk, **{field_name: name}).exists():
+        return None
+
+    before = storage.size(name)
+    with storage.open(name) as f:
+        result = images.normalize(f, config['MAX_SIZE'], config['FORMAT'], config['QUALITY'])
+    if result is None:
+        return None
+    content, extension = result
+    new_name = storage.save(images.normalized_name(name, extension), ContentFile(content))
+    if on_stored is not None:
+        on_stored(new_name)
+
+    with transaction.atomic():
+        obj = model._base_manager.select_for_update().filter(pk=pk, **{field_name: name}).first()
+        if obj is None:
+            # replaced or deleted while this ran
+            storage.delete(new_name)
+            return None
+        getattr(obj, field_name).name = new_name
+        update_fields = [field_name]
+        if any(f.name == 'updated' for f in model._meta.concrete_fields):
+            update_fields.append('updated')
+        obj.save(update_fields=update_fields)
+
+    if not config['KEEP_ORIGINAL']:
+        # the original, its thumbnails and their key value store entries
+        delete_image(name)
+    metrics = {
+        'name': new_name,
+        'before': before,
+        'after': len(content),
+        'saved': before - len(content),
+        'seconds': time.monotonic() - started,
+    }
+    logger.info('normalized %(name)s, %(before)d to %(after)d bytes, %(saved)d saved in %(seconds).3fs', metrics)
+    return metrics
+
+
+def process_photo(profile_pk: int, photo_name: str):
+    """
+    Normalizes a newly uploaded profile photo then generates its thumbnails,
+    those of the original when normalizing fails. The original and the
+    normalized names stay claimed for enqueue_thumbnails until this is done.
+    """
+    claimed = [photo_name]
+
+    def stored(new_name):
+        if _claim_thumbnails(new_name):
+            claimed.append(new_name)
+
+    try:
+        metrics = normalize_upload(Profile, profile_pk, 'photo', photo_name, on_stored=stored)
+    except Exception:
+        logger.exception('normalizing %s failed, keeping the original', photo_name)
+        metrics = None
+    try:
+        generate_thumbnails(metrics['name'] if metrics else photo_name)
+    finally:
+        with _pending_lock:
+            _pending_thumbnails.difference_update(claimed)
+    return metrics
+
+
+def enqueue_photo(profile):
+    """process_photo on image_pool once the current transaction commits"""
+    if profile.photo:
+        pk, name = profile.pk, profile.photo.name
+
+        def submit():
+            # claimed even when already queued, process_photo normalizes it first
+            _claim_thumbnails(name)
+            image_pool.submit(process_photo, pk, name)
+
+        transaction.on_commit(submit)
+
+
+def enqueue_attachment(attachment):
+    """normalize_upload of an uploaded image attachment on image_pool once the current transaction commits"""
+    if attachment.file and attachment.model_type == Attachment.AttachmentTypes.IMAGE:
+        pk, name = attachment.pk, attachment.file.name
+        transaction.on_commit(lambda: image_pool.submit(normalize_upload, Attachment, pk, 'file', name))
+
+
+def fetch_remote_image(url: str) -> dict | None:
+    """
+    Stores a local copy of an image attachment's remote url and its
+    thumbnail, then saves the attachments using the url so their cached
+    renders and profile versions are refreshed.
+    Failures are recorded for remote.backing_off and return None.
+    """
+    started = time.monotonic()
+    try:
+        content = remote.fetch(url)
+    except remote.RemoteImageError as e:
+        failure = remote.record_failure(url, e)
+        logger.warning('fetching %s failed %d times: %s', url, failure['failures'], e)
+        schedule_remote_retry(url, failure)
+        return None
+    finally:
+        with _pending_lock:
+            _pending_remote.discard(url)
+
+    name = remote.local_name(url)
+    storage = Attachment._meta.get_field('file').storage
+    # drop an older copy with its thumbnails so the name is reused
+    delete_image(name)
+    storage.save(name, ContentFile(content))
+    get_thumbnail(name, consts.ATTACHMENT_THUMBNAIL_SIZE, crop='center')
+    remote.forget_failures(url)
+
+    for attachment in Attachment.objects.filter(url=url, model_type=Attachment.AttachmentTypes.IMAGE):
+        attachment.save(update_fields=['updated'])
+    metrics = {'url': url, 'bytes': len(content), 'seconds': time.monotonic() - started}
+    logger.info('fetched %(url)s, %(bytes)d bytes in %(seconds).3fs', metrics)
+    return metrics
+
+
+def enqueue_remote_image(url: str):
+    """
+    fetch_remote_image on remote_pool, skipped while the url is backing off,
+    already queued or the queue holds MAX_PENDING urls
+    """
+    if not url or remote.backing_off(url):
+        return
+    _submit_remote_image(url)
+
+
+def _submit_remote_image(url: str):
+    with _pending_lock:
+        if url in _pending_remote or len(_pending_remote) >= remote.remote_images_config()['MAX_PENDING']:
+            return
+        _pending_remote.add(url)
+    remote_pool.submit(fetch_remote_image, url)
+
+
+def schedule_remote_retry(url: str, failure: dict):
+    """
+    Fetches a failed url again at its retry_at. The placeholder render of
+    its attachments stays cached until a fetch succeeds and saves them, so
+    retries can't wait for enqueue_remote_image to be called by a render.
+    Gives up after MAX_RETRIES failures in a row and holds at most
+    MAX_PENDING retries.
+    """
+    config = remote.remote_images_config()
+    if failure['failures'] > config['MAX_RETRIES']:
+        return
+    with _pending_lock:
+        if url in _remote_retries or len(_remote_retries) >= config['MAX_PENDING']:
+            return
+        timer = threading.Timer(max(failure['retry_at'] - time.time(), 0), _retry_remote_image, [url])
+        timer.daemon = True
+        _remote_retries[url] = timer
+    timer.start()
+
+
+def _retry_remote_image(url: str):
+    with _pending_lock:
+        _remote_retries.pop(url, None)
+    _submit_remote_image(url)
+
+
+def start():
+    """starts the in process link sweeper when settings.PROFILE_LINK_SWEEP is set"""
+    global _link_sweeper
+    config = getattr(settings, 'PROFILE_LINK_SWEEP', None)
+    if not config or _link_sweeper is not None:
+        return
+    _link_sweeper = PeriodicTask(sweep_links, config.get('INTERVAL', 300), name='profile-link-sweeper')
+    _link_sweeper.start()
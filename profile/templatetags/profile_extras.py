@@ -1,7 +1,9 @@
-import markdown
 from django import template
 from django.utils.safestring import mark_safe
 
+from profile import tasks
+from profile.utils import consts, thumbnails, remote, markup
+
 
 register = template.Library()
 
@@ -26,4 +28,36 @@ def get_verbose_name_plural(obj):
 
 @register.filter(name='markdown')
 def markdown_format(text):
-    return mark_safe(markdown.markdown(text))
+    return mark_safe(markup.render_markdown(text))
+
+
+@register.simple_tag
+def profile_thumbnail(photo, geometry):
+    """
+    Pre-generated thumbnail of a profile photo, see tasks.generate_thumbnails.
+    Falls back to the original image while the thumbnail is missing and
+    queues its generation, so requests never resize photos themselves.
+    """
+    if not photo:
+        return None
+    thumbnail = thumbnails.existing_thumbnail(photo, geometry, **consts.PROFILE_PHOTO_THUMBNAIL_OPTIONS)
+    if thumbnail is None:
+        tasks.enqueue_thumbnails(photo.name)
+        return thumbnails.OriginalImage(photo, geometry)
+    return thumbnail
+
+
+@register.simple_tag
+def remote_thumbnail(url):
+    """
+    Thumbnail of the local copy of an image attachment's url, None until
+    tasks.fetch_remote_image stored it. Pages never wait on remote hosts.
+    """
+    if not url:
+        return None
+    thumbnail = thumbnails.existing_thumbnail(
+        remote.local_name(url), consts.ATTACHMENT_THUMBNAIL_SIZE, crop='center',
+    )
+    if thumbnail is None:
+        tasks.enqueue_remote_image(url)
+    return thumbnail
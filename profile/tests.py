@@ -1,3 +1,1479 @@
-from django.test import TestCase
+import io
+import json
+import uuid
+import time
+import shutil
+import tempfile
+import threading
+import datetime as dt
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+import vobject
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache, caches
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from profile import models, tasks
+from profile.models import profile as profile_models
+from profile.fields import OrderField, bulk_create_ordered
+from profile.management.commands import bench_vcard
+from profile.templatetags import profile_extras
+from profile.utils import consts, graph, images, library, markup, qr, remote, search, thumbnails, vcard
+from profile.utils.cache import render_cache
+from profile.utils.counters import CountBuffer
+from profile.utils.scheduler import PeriodicTask
+
+
+def make_profile(username='alex'):
+    """a profile showing an email with a skill attached, then a work experience"""
+    user = get_user_model().objects.create_user(username, f'{username}@example.com')
+    profile = models.Profile(user=user, title='Work', first_name='Alex', last_name='B', headline='Hello')
+    profile.save()
+    email = models.Email.objects.create(user=user, label='work', email_address=f'{username}@example.com')
+    skill = models.Skill.objects.create(user=user, label='Django')
+    job = models.WorkExperience.objects.create(
+        user=user, label='Developer', organization='Org', date=dt.date(2020, 1, 1), description='**bold**',
+    )
+    content = models.Content(profile=profile, item=email)
+    content.save()
+    models.ContentContent(content=content, item=skill).save()
+    models.Content(profile=profile, item=job).save()
+    return profile
+
+
+def add_contents(profile, count):
+    """`count` more emails with a skill attached and work experiences on `profile`"""
+    user = profile.user
+    start = models.Content.objects.filter(profile=profile).count()
+    for i in range(start, start + count):
+        email = models.Email.objects.create(user=user, label='home', email_address=f'{i}@example.com')
+        content = models.Content(profile=profile, item=email)
+        content.save()
+        models.ContentContent(content=content, item=models.Skill.objects.create(user=user, label=f'Skill {i}')).save()
+        job = models.WorkExperience.objects.create(user=user, label=f'Job {i}', organization='Org', date=dt.date(2020, 1, 1))
+        models.Content(profile=profile, item=job).save()
+
+
+class LoadContentsTest(TestCase):
+    def test_items_loaded(self):
+        profile = make_profile()
+        contents = profile.load_contents()
+        with self.assertNumQueries(0):
+            email, job = (content.item for content in contents)
+            skills = [subcontent.item for subcontent in contents[0].subcontents.all()]
+        self.assertEqual(email.email_address, 'alex@example.com')
+        self.assertEqual(job.organization, 'Org')
+        self.assertEqual([skill.label for skill in skills], ['Django'])
+
+    def test_queries_per_content_type(self):
+        profile = make_profile()
+        # contents, subcontents, then one query each for emails, skills and work experiences
+        profile.load_contents()
+        with self.assertNumQueries(5):
+            profile.load_contents()
+        add_contents(profile, 5)
+        with self.assertNumQueries(5):
+            self.assertEqual(len(profile.load_contents()), 12)
+
+    def test_page_queries_dont_grow(self):
+        profile = make_profile()
+        self.client.force_login(profile.user)
+        url = reverse('profile', kwargs={'profile_pk': profile.pk})
+        self.client.get(url)
+
+        def page_queries():
+            caches['fragments'].clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            return len(queries)
+
+        before = page_queries()
+        add_contents(profile, 5)
+        self.assertEqual(page_queries(), before)
+
+
+class RenderCacheTest(TestCase):
+    def setUp(self):
+        caches['fragments'].clear()
+        render_cache.reset_stats()
+        self.skill = models.Skill.objects.create(
+            user=get_user_model().objects.create_user('alex', 'alex@example.com'),
+            label='Django',
+        )
+
+    def test_hit(self):
+        html = self.skill.render()
+        self.assertIn('Django', html)
+        with mock.patch.object(models.Skill, 'render_uncached') as render_uncached:
+            self.assertEqual(models.Skill.objects.get(pk=self.skill.pk).render(), html)
+        render_uncached.assert_not_called()
+        self.assertEqual(render_cache.stats(), {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_save_invalidates(self):
+        self.skill.render()
+        self.skill.label = 'Python'
+        self.skill.save()
+        self.assertIsNone(caches['fragments'].get(render_cache.key(self.skill)))
+        self.assertIn('Python', self.skill.render())
+
+    def test_stale_entry_missed(self):
+        self.skill.render()
+        # queryset updates send no signals, the changed timestamp still misses
+        models.Skill.objects.filter(pk=self.skill.pk).update(label='Python', updated=timezone.now())
+        self.assertIn('Python', models.Skill.objects.get(pk=self.skill.pk).render())
+        self.assertEqual(render_cache.stats()['misses'], 2)
+
+    def test_delete_invalidates(self):
+        self.skill.render()
+        key = render_cache.key(self.skill)
+        self.skill.delete()
+        self.assertIsNone(caches['fragments'].get(key))
+
+
+class RenderMarkdownTest(TestCase):
+    def test_renders_markdown(self):
+        self.assertEqual(
+            markup.render_markdown('**bold**\nnext [site](https://example.com)'),
+            '<p><strong>bold</strong><br />\nnext <a href="https://example.com">site</a></p>',
+        )
+
+    def test_escapes_raw_html(self):
+        html = markup.render_markdown('<script>alert(1)</script> <a href="javascript:alert(1)">x</a>')
+        self.assertNotIn('<script', html)
+        self.assertNotIn('<a ', html)
+
+    def test_drops_unsafe_urls(self):
+        vectors = (
+            '[x](javascript:alert(1))',
+            '[x](JaVaScRiPt:alert(1))',
+            '[x](&#106;avascript:alert(1))',
+            '[x](&#0000106avascript:alert(1))',
+            '[x](java&#x09;script:alert(1))',
+            '[x](javascript&colon;alert(1))',
+            '[x](java\\script:alert(1))',
+            '[x](<javascript:alert(1)>)',
+            '[x](data:text/html;base64,PHNjcmlwdD4=)',
+            '[x](vbscript:msgbox)',
+            '![x](javascript:alert(1))',
+            '[x][ref]\n\n[ref]: &#x6A;avascript:alert(1)',
+        )
+        for text in vectors:
+            with self.subTest(text=text):
+                html = markup.render_markdown(text)
+                self.assertNotIn('href', html)
+                self.assertNotIn('src', html)
+
+    def test_keeps_safe_urls(self):
+        for url in ('https://example.com/?a=1', 'mailto:a@example.com', '/relative/path:x', '#top'):
+            with self.subTest(url=url):
+                self.assertIn(f'href="{url}"', markup.render_markdown(f'[x]({url})'))
+
+
+class RenderDescriptionsTest(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user('alex', 'alex@example.com')
+        self.jobs = [
+            models.WorkExperience.objects.create(
+                user=user, label=f'Job {i}', date=dt.date(2020, 1, 1), description=f'**job {i}**',
+            )
+            for i in range(5)
+        ]
+        models.WorkExperience.objects.update(description_html='')
+
+    def html(self):
+        return list(models.WorkExperience.objects.order_by('pk').values_list('description_html', flat=True))
+
+    def render(self, *args, **options):
+        out = io.StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('render_descriptions', *args, stdout=out, **options)
+        self.updates = sum(q['sql'].startswith('UPDATE "profile_workexperience"') for q in queries)
+        return out.getvalue()
+
+    def test_batches(self):
+        self.assertIn('work experiences: rendered 5', self.render(batch_size=2))
+        self.assertEqual(self.html(), [f'<p><strong>job {i}</strong></p>' for i in range(5)])
+        self.assertEqual(self.updates, 3)
+
+    def test_only_missing_html(self):
+        models.WorkExperience.objects.filter(pk=self.jobs[0].pk).update(description_html='kept')
+        self.assertIn('work experiences: rendered 4', self.render())
+        self.assertEqual(self.html()[0], 'kept')
+        self.assertIn('work experiences: rendered 5', self.render('--all'))
+        self.assertEqual(self.html()[0], '<p><strong>job 0</strong></p>')
+
+    def test_edited_while_rendering(self):
+        render_markdown = markup.render_markdown
+
+        def edit_first(text):
+            if text == '**job 1**':
+                job = models.WorkExperience.objects.get(pk=self.jobs[0].pk)
+                job.description = 'edited'
+                job.save()
+            return render_markdown(text)
+
+        with mock.patch.object(markup, 'render_markdown', side_effect=edit_first):
+            self.assertIn('work experiences: rendered 4', self.render())
+        self.assertEqual(self.html()[:2], ['<p>edited</p>', '<p><strong>job 1</strong></p>'])
+
+
+class OrderFieldTest(TestCase):
+    def test_bulk_allocation_continues_each_group(self):
+        first, second = make_profile('alex'), make_profile('sam')
+        skills = [models.Skill.objects.create(user=first.user, label=f'skill{i}') for i in range(3)]
+        contents = [models.Content(profile=profile, item=skill) for skill in skills for profile in (first, second)]
+        with CaptureQueriesContext(connection) as queries:
+            bulk_create_ordered(models.Content, contents)
+        # one query for the orders, one insert
+        self.assertEqual(len([q for q in queries if 'SAVEPOINT' not in q['sql']]), 2)
+        for profile in (first, second):
+            self.assertEqual(list(profile.contents.values_list('order', flat=True)), [0, 1, 2, 3, 4])
+
+    def test_last_order_without_for_fields(self):
+        profile = make_profile()
+        models.Content.objects.filter(profile=profile).update(order=0)
+        models.Content.objects.filter(pk=profile.contents.order_by('pk').first().pk).update(order=5)
+        field = OrderField(blank=True)
+        field.set_attributes_from_name('order')
+        field.model = models.Content
+        self.assertEqual(field.last_orders([()]), {(): 5})
+        models.Content.objects.all().delete()
+        self.assertEqual(field.last_orders([()]), {})
+
+    def test_compact(self):
+        profile = make_profile()
+        for content, order in zip(profile.contents.order_by('order'), (3, 7)):
+            models.Content.objects.filter(pk=content.pk).update(order=order)
+        self.assertEqual(models.Content._meta.get_field('order').compact(profile=profile), 2)
+        self.assertEqual(list(profile.contents.values_list('order', flat=True)), [0, 1])
+
+
+class VcardExportTest(TestCase):
+    fixtures = ['linkbases']
+
+    def add_github(self, profile, username):
+        link = models.Link(user=profile.user, url=username, model_type_id=2)
+        link.save()
+        models.Content(profile=profile, item=link).save()
+
+    def test_link_url_includes_netloc(self):
+        profile = make_profile()
+        self.add_github(profile, 'alex-b')
+        self.client.force_login(profile.user)
+        response = self.client.get(reverse('profile_vcard', kwargs={'profile_pk': profile.pk}))
+        self.assertIn('URL:https://github.com/alex-b\r\n', response.content.decode())
+
+    def test_connections_export_queries_per_chunk(self):
+        viewer = make_profile('viewer')
+        self.client.force_login(viewer.user)
+        url = reverse('connections_vcard')
+
+        def export():
+            with CaptureQueriesContext(connection) as queries:
+                body = b''.join(self.client.get(url).streaming_content).decode()
+            return body, len(queries)
+
+        # warms the content type cache
+        export()
+        for name in ('sam', 'kim'):
+            other = make_profile(name)
+            self.add_github(other, name)
+            models.Connection.objects.create(profile_from=viewer, profile_to=other)
+        body, two = export()
+        self.assertIn('URL:https://github.com/kim', body)
+        for name in ('lee', 'max', 'ann'):
+            other = make_profile(name)
+            self.add_github(other, name)
+            models.Connection.objects.create(profile_from=viewer, profile_to=other)
+        body, five = export()
+        self.assertEqual(body.count('URL:https://github.com/'), 5)
+        self.assertEqual(two, five)
+
+    def test_shared_download_counted(self):
+        link = make_profile().links.get()
+        models.ProfileLink.objects.filter(pk=link.pk).update(max_views=2)
+        url = reverse('shared_profile_vcard', kwargs={'uid': link.uid})
+        self.assertEqual(self.client.get(url).status_code, 200)
+        # downloading again in the same session isn't another view
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(models.ProfileLink.objects.get(pk=link.pk).views, 1)
+        self.assertEqual(self.client_class().get(url).status_code, 200)
+        self.assertTrue(models.ProfileLink.objects.get(pk=link.pk).is_expired)
+        self.assertEqual(self.client_class().get(url).status_code, 404)
+
+
+class ProfileVersionTest(TestCase):
+    def version(self, profile):
+        return models.Profile.objects.values_list('version', flat=True).get(pk=profile.pk)
+
+    def test_stale_save_keeps_version(self):
+        profile = make_profile()
+        stale = models.Profile.objects.get(pk=profile.pk)
+        models.Skill.objects.get(label='Django').save()
+        edited = self.version(profile)
+        self.assertGreater(edited, stale.version)
+        stale.headline = 'New'
+        stale.save()
+        self.assertEqual(self.version(profile), edited + 1)
+        self.assertEqual(models.Profile.objects.get(pk=profile.pk).headline, 'New')
+
+    def test_update_fields_skip_version(self):
+        profile = make_profile()
+        before = self.version(profile)
+        profile.version = 0
+        profile.headline = 'New'
+        profile.save(update_fields=['headline', 'version'])
+        self.assertEqual(self.version(profile), before + 1)
+
+    def test_deferred_fields_stay_deferred(self):
+        profile = make_profile()
+        partial = models.Profile.objects.only('headline').get(pk=profile.pk)
+        partial.headline = 'New'
+        with self.assertNumQueries(2):
+            # the UPDATE and the version bump
+            partial.save()
+        self.assertEqual(models.Profile.objects.get(pk=profile.pk).first_name, 'Alex')
+
+
+class ContentOrderTest(TestCase):
+    def setUp(self):
+        self.profile = make_profile()
+        self.email, self.job = self.profile.contents.order_by('order')
+        self.client.force_login(self.profile.user)
+        self.url = reverse('content_order')
+
+    def post(self, data):
+        return self.client.post(self.url, json.dumps(data), content_type='application/json')
+
+    def orders(self, model=models.Content):
+        return dict(model.objects.values_list('pk', 'order'))
+
+    def test_reorder(self):
+        version = models.Profile.objects.get(pk=self.profile.pk).version
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post({'content': {self.email.pk: 1, self.job.pk: 0}})
+        self.assertEqual(response.json(), {'saved': 'OK', 'rejected': []})
+        self.assertEqual(self.orders(), {self.email.pk: 1, self.job.pk: 0})
+        self.assertGreater(models.Profile.objects.get(pk=self.profile.pk).version, version)
+        content_queries = [q['sql'] for q in queries if '"profile_content"' in q['sql']]
+        self.assertEqual([sql.split()[0] for sql in content_queries], ['SELECT', 'UPDATE'])
+
+    def test_reorder_attachments(self):
+        skill = models.ContentContent.objects.get()
+        response = self.post({'attachments': {skill.pk: 3}})
+        self.assertEqual(response.json()['rejected'], [])
+        self.assertEqual(self.orders(models.ContentContent), {skill.pk: 3})
+
+    def test_rejects_others_content(self):
+        other = make_profile('sam').contents.first()
+        before = self.orders()
+        response = self.post({'content': {other.pk: 5, self.email.pk: -1, 0: 1}})
+        self.assertEqual(sorted(response.json()['rejected']), [0, self.email.pk, other.pk])
+        self.assertEqual(self.orders(), before)
+
+    def test_bad_requests(self):
+        pk = str(self.email.pk)
+        for body in (
+            [],
+            ['content'],
+            {'content': [1, 2]},
+            {'content': {pk: '1'}},
+            {'content': {pk: 1.5}},
+            {'content': {pk: True}},
+            {'content': {pk: None}},
+            {'content': {'one': 1}},
+            {'profile': {pk: 1}},
+            {'content': {}, 'attachments': {}},
+            'content',
+            1,
+        ):
+            with self.subTest(body=body):
+                self.assertEqual(self.post(body).status_code, 400)
+        self.assertEqual(self.client.post(self.url, '{', content_type='application/json').status_code, 400)
+        self.assertEqual(self.orders()[self.email.pk], self.email.order)
+
+
+class SelectContentTest(TestCase):
+    def setUp(self):
+        self.profile = make_profile()
+        self.user = self.profile.user
+        self.client.force_login(self.user)
+        self.email = models.Email.objects.get(user=self.user)
+        self.skill = models.Skill.objects.get(user=self.user)
+        self.job = models.WorkExperience.objects.get(user=self.user)
+        self.url = reverse('profile_content_select', kwargs={'profile_pk': self.profile.pk})
+
+    def select(self, url, **selected):
+        data = {f'{name}form-model_choice': [item.pk for item in items] for name, items in selected.items()}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+        return [q['sql'] for q in queries]
+
+    def test_diff(self):
+        kept = models.Content.objects.get(object_id=self.email.pk, content_type__model='email')
+        added = [models.Skill.objects.create(user=self.user, label=f'Skill {i}') for i in range(3)]
+        version = models.Profile.objects.get(pk=self.profile.pk).version
+        queries = self.select(self.url, email=[self.email], skill=added, workexperience=[])
+        items = {(content.content_type.model, content.object_id) for content in self.profile.contents.all()}
+        self.assertEqual(items, {('email', self.email.pk), *(('skill', skill.pk) for skill in added)})
+        self.assertTrue(models.Content.objects.filter(pk=kept.pk).exists())
+        self.assertGreater(models.Profile.objects.get(pk=self.profile.pk).version, version)
+        # one bulk insert and one delete however many items changed
+        self.assertEqual(sum(sql.startswith('INSERT INTO "profile_content"') for sql in queries), 1)
+        self.assertEqual(sum(sql.startswith('DELETE FROM "profile_content"') for sql in queries), 1)
+        self.assertEqual(models.ItemCatalog.objects.get(content_type__model='skill', object_id=added[0].pk).usage_count, 1)
+
+    def test_unchanged_selection_writes_nothing(self):
+        queries = self.select(self.url, email=[self.email], skill=[], workexperience=[self.job])
+        self.assertFalse([sql for sql in queries if sql.startswith(('INSERT', 'DELETE'))])
+        self.assertEqual(self.profile.contents.count(), 2)
+
+    def test_attachments(self):
+        content = models.Content.objects.get(object_id=self.email.pk, content_type__model='email')
+        url = reverse('content_content_select', kwargs={'profile_pk': self.profile.pk, 'content_pk': content.pk})
+        other = models.Skill.objects.create(user=self.user, label='Python')
+        self.select(url, email=[], skill=[other], workexperience=[self.job])
+        self.assertEqual(
+            {(sub.content_type.model, sub.object_id) for sub in content.subcontents.all()},
+            {('skill', other.pk), ('workexperience', self.job.pk)},
+        )
+        self.assertEqual(self.profile.contents.count(), 2)
+
+
+class ItemLibraryTest(TestCase):
+    def setUp(self):
+        self.profile = make_profile()
+        self.user = self.profile.user
+        self.lib = library.ItemLibrary(self.user, library.category_kinds())
+
+    def test_rows_in_one_query(self):
+        models.Email.objects.create(user=self.user, label='home', email_address='home@example.com')
+        with self.assertNumQueries(1):
+            rows = list(self.lib.rows())
+        self.assertEqual([row['label'] for row in rows], ['home', 'work', 'Developer', 'Django'])
+        with self.assertNumQueries(1):
+            self.assertEqual(self.lib.counts(), {'Email': 2, 'Work Experience': 1, 'Skill': 1})
+
+    def test_other_users_left_out(self):
+        make_profile('sam')
+        self.assertEqual(len(self.lib.rows()), 3)
+
+    def test_grouped(self):
+        page = self.lib.page(1, per_page=2)
+        self.assertEqual(page.paginator.count, 3)
+        grouped = self.lib.grouped(page.object_list)
+        self.assertEqual(list(grouped), ['Contact Info', 'Professional'])
+        self.assertEqual([item.label for item in grouped['Professional']['Work Experience']], ['Developer'])
+
+    def test_page_queries_dont_grow(self):
+        self.client.force_login(self.user)
+        url = reverse('content')
+        self.client.get(url)
+
+        def page_queries():
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            return len(queries)
+
+        before = page_queries()
+        add_contents(self.profile, 5)
+        self.assertEqual(page_queries(), before)
+
+
+class ItemCatalogTest(TestCase):
+    def setUp(self):
+        self.profile = make_profile()
+        self.user = self.profile.user
+
+    def entries(self):
+        return {
+            (entry.content_type.model, entry.label): (entry.category, entry.usage_count)
+            for entry in models.ItemCatalog.objects.filter(user=self.user)
+        }
+
+    def test_synced_by_signals(self):
+        self.assertEqual(self.entries(), {
+            ('email', 'work'): ('Contact Info', 1),
+            ('skill', 'Django'): ('Professional', 1),
+            ('workexperience', 'Developer'): ('Professional', 1),
+        })
+        job = models.WorkExperience.objects.get(user=self.user)
+        job.label = 'Architect'
+        job.save()
+        models.Content.objects.get(object_id=job.pk, content_type__model='workexperience').delete()
+        self.assertEqual(self.entries()[('workexperience', 'Architect')], ('Professional', 0))
+        job.delete()
+        self.assertNotIn(('workexperience', 'Architect'), self.entries())
+
+    def test_sync_keeps_usage(self):
+        skill = models.Skill.objects.get(user=self.user)
+        skill.label = 'Python'
+        models.ItemCatalog.sync([models.ItemCatalog.entry_for(skill)])
+        self.assertEqual(self.entries()[('skill', 'Python')], ('Professional', 1))
+        models.ItemCatalog.sync([models.ItemCatalog.entry_for(skill)], with_usage=True)
+        self.assertEqual(self.entries()[('skill', 'Python')], ('Professional', 0))
+
+    def test_rebuild(self):
+        expected = self.entries()
+        models.ItemCatalog.objects.all().delete()
+        call_command('build_item_catalog', stdout=io.StringIO())
+        self.assertEqual(self.entries(), expected)
+
+
+class SharedProfileConditionalTest(TestCase):
+    fixtures = ['linkbases']
+
+    def setUp(self):
+        self.profile = make_profile()
+        self.link = self.profile.links.get()
+        self.url = reverse('shared_profile', kwargs={'uid': self.link.uid})
+
+    def views(self):
+        return models.ProfileLink.objects.get(pk=self.link.pk).views
+
+    def etag(self, client):
+        """etag of the page once the client holds a csrf cookie"""
+        client.get(self.url)
+        return client.get(self.url)['ETag']
+
+    def test_not_modified(self):
+        etag = self.etag(self.client)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertLess(len(queries), 5)
+
+    def test_views_counted_on_304(self):
+        etag = self.etag(self.client)
+        self.assertEqual(self.views(), 1)
+        # revalidating in the same session isn't another view
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.views(), 1)
+        # a new session with the page cached is
+        fresh = self.client_class()
+        fresh.cookies['csrftoken'] = self.client.cookies['csrftoken'].value
+        self.assertEqual(fresh.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.views(), 2)
+
+    def test_edit_changes_etag(self):
+        etag = self.etag(self.client)
+        models.Skill.objects.get(label='Django').save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_csrf_cookie_changes_etag(self):
+        etag = self.etag(self.client)
+        del self.client.cookies['csrftoken']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('csrftoken', response.cookies)
+
+    def test_login_changes_etag(self):
+        etag = self.etag(self.client)
+        viewer = get_user_model().objects.create_user('viewer', 'viewer@example.com')
+        self.client.force_login(viewer)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_no_etag_with_messages(self):
+        viewer = make_profile('viewer')
+        self.client.force_login(viewer.user)
+        self.client.post(self.url, {'profile_from': viewer.pk, 'message': 'hi'})
+        response = self.client.get(self.url)
+        self.assertContains(response, 'connection request has been sent')
+        self.assertNotIn('ETag', response)
+
+
+class VcardReadTest(TestCase):
+    fixtures = ['linkbases']
+
+    def blocks(self):
+        with open(bench_vcard.CORPUS, 'rb') as f:
+            return list(vcard.iter_vcard_blocks(f))
+
+    def test_corpus_matches_vobject(self):
+        tokenized = vobject_only = 0
+        for number, raw_lines in enumerate(self.blocks(), start=1):
+            with self.subTest(card=number):
+                try:
+                    fast = vcard.tokenize_vcard(raw_lines)
+                except vcard.VcardSyntaxError:
+                    vobject_only += 1
+                    continue
+                tokenized += 1
+                try:
+                    slow = vobject.readOne('\r\n'.join(raw_lines) + '\r\n')
+                except Exception:
+                    # vobject can't read the quoted-printable card 2
+                    continue
+                self.assertEqual(
+                    bench_vcard.model_dict_values(vcard.component_to_model_dict(fast)),
+                    bench_vcard.without_vobject_quirks(
+                        bench_vcard.model_dict_values(vcard.component_to_model_dict(slow))
+                    ),
+                )
+        self.assertEqual((tokenized, vobject_only), (9, 1))
+
+    def test_unescapes_colons(self):
+        model_dict = vcard.component_to_model_dict(vcard.tokenize_vcard(self.blocks()[2]))
+        links = [item for item in model_dict['items'] if isinstance(item, models.Link)]
+        self.assertEqual([link.url for link in links], ['https://example.com/ada'])
+
+    def test_reads_quoted_printable_and_folding(self):
+        raw_lines = [
+            '\ufeffBEGIN:VCARD',
+            'VERSION:2.1',
+            'N;CHARSET=UTF-8;ENCODING=QUOTED-PRINTABLE:M=C3=BCller;J=C3=BCrgen;;;',
+            'NOTE;CHARSET=UTF-8;ENCODING=QUOTED-PRINTABLE:first=0D=0Asec=',
+            'ond',
+            'TITLE:folded',
+            '  title',
+            'TEL;CELL:+1 202 555 0123',
+            'END:VCARD',
+        ]
+        [block] = vcard.iter_vcard_blocks(raw_lines)
+        card = vcard.tokenize_vcard(block)
+        self.assertEqual(card.contents['n'][0].value.family, 'Müller')
+        self.assertEqual(card.contents['note'][0].value, 'first\r\nsecond')
+        self.assertEqual(card.contents['title'][0].value, 'folded title')
+        self.assertEqual(card.contents['tel'][0].singletonparams, ['CELL'])
+
+    def test_escapes(self):
+        self.assertEqual(vcard.split_unescaped('a\\;b;c', ';'), ['a\\;b', 'c'])
+        self.assertEqual(vcard.unescape('one\\ntwo\\, three\\; four\\\\'), 'one\ntwo, three; four\\')
+
+    def test_nested_cards_left_to_vobject(self):
+        block = self.blocks()[-1]
+        with self.assertRaises(vcard.VcardSyntaxError):
+            vcard.tokenize_vcard(block)
+        self.assertIsNotNone(vcard.read_vcard(block))
+
+    def test_import_corpus(self):
+        user = get_user_model().objects.create_user('importer', 'importer@example.com')
+        importer = vcard.VcardImport(user, chunk_size=4)
+        with open(bench_vcard.CORPUS, 'rb') as f:
+            importer.run(f)
+        self.assertEqual(importer.read, 10)
+        self.assertEqual(models.Profile.objects.filter(user=user).count(), importer.imported)
+        self.assertGreaterEqual(importer.imported, 9)
+        ada = models.Profile.objects.get(user=user, first_name='Ada')
+        self.assertEqual([str(c.item) for c in ada.content_list if c.content_type.model == 'link'], ['https://example.com/ada'])
+
+
+class SharedProfileJsonTest(TestCase):
+    fixtures = ['linkbases']
+
+    def setUp(self):
+        caches['fragments'].clear()
+        self.profile = make_profile()
+        self.link = self.profile.links.get()
+        self.url = reverse('shared_profile_json', kwargs={'uid': self.link.uid})
+
+    def test_payload(self):
+        data = self.client.get(self.url).json()
+        self.assertEqual(data['api_version'], 1)
+        self.assertEqual(data['profile']['fn'], 'Alex B')
+        self.assertNotIn('title', data['profile'])
+        email, job = data['contents']
+        self.assertEqual(email['type'], 'email')
+        self.assertEqual(email['attachments'], [{'type': 'skill', 'id': email['attachments'][0]['id'], 'label': 'Django'}])
+        self.assertEqual(job['description'], '**bold**')
+        self.assertEqual(job['date'], '2020-01-01')
+        for key in ('description_html', 'created', 'updated', 'user'):
+            self.assertNotIn(key, job)
+
+    def test_sparse_fieldsets(self):
+        data = self.client.get(self.url, {'fields[profile]': 'fn', 'fields[email]': 'email_address,unknown'}).json()
+        self.assertEqual(set(data['profile']), {'id', 'version', 'fn'})
+        email, job = data['contents']
+        self.assertEqual(set(email), {'type', 'id', 'email_address', 'attachments'})
+        # types without a fieldset keep all their fields
+        self.assertEqual(job['organization'], 'Org')
+
+    def test_conditional_and_counted_once(self):
+        response = self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(models.ProfileLink.objects.get(pk=self.link.pk).views, 1)
+        other = self.client_class()
+        self.assertEqual(other.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(models.ProfileLink.objects.get(pk=self.link.pk).views, 2)
+
+    def test_edit_changes_payload(self):
+        etag = self.client.get(self.url)['ETag']
+        models.Skill.objects.get(label='Django').save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_expired_link(self):
+        models.ProfileLink.objects.filter(pk=self.link.pk).update(is_expired=True)
+        models.ProfileLink.forget(self.link.uid)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class LinkViewTest(TestCase):
+    def setUp(self):
+        self.link = make_profile().links.get()
+
+    def reload(self):
+        return models.ProfileLink.objects.get(pk=self.link.pk)
+
+    def test_record_view(self):
+        for _ in range(5):
+            self.link.record_view()
+        link = self.reload()
+        self.assertEqual(link.views, 5)
+        self.assertFalse(link.is_expired)
+        self.assertEqual(self.link.views, 5)
+
+    def test_expires_at_max_views(self):
+        models.ProfileLink.objects.filter(pk=self.link.pk).update(max_views=3)
+        link = models.ProfileLink.resolve(self.link.uid)
+        link.record_view()
+        link.record_view()
+        self.assertFalse(self.reload().is_expired)
+        link.record_view()
+        self.assertTrue(self.reload().is_expired)
+        self.assertIsNone(models.ProfileLink.resolve(self.link.uid))
+
+    def test_add_views(self):
+        other = make_profile('sam').links.get()
+        models.ProfileLink.objects.filter(pk=other.pk).update(max_views=3)
+        models.ProfileLink.add_views({self.link.pk: 4, other.pk: 5})
+        self.assertEqual((self.reload().views, self.reload().is_expired), (4, False))
+        other = models.ProfileLink.objects.get(pk=other.pk)
+        self.assertEqual((other.views, other.is_expired), (5, True))
+
+    def test_add_views_expires_timed_out_link(self):
+        models.ProfileLink.objects.filter(pk=self.link.pk).update(
+            expires=timezone.now() - dt.timedelta(minutes=1),
+        )
+        models.ProfileLink.add_views({self.link.pk: 1})
+        self.assertTrue(self.reload().is_expired)
+
+    @override_settings(PROFILE_LINK_VIEW_BUFFER={'MAX_VIEWS': 3, 'MAX_SECONDS': 60})
+    def test_buffered(self):
+        with mock.patch('profile.models.profile._link_view_buffer', None):
+            buffer = profile_models.link_view_buffer()
+            self.addCleanup(buffer.flush)
+            self.link.record_view()
+            self.link.record_view()
+            self.assertEqual(self.reload().views, 0)
+            self.link.record_view()
+            self.assertEqual(self.reload().views, 3)
+            self.link.record_view()
+            buffer.flush()
+            self.assertEqual(self.reload().views, 4)
+
+    @override_settings(PROFILE_LINK_VIEW_BUFFER={'MAX_VIEWS': 3, 'MAX_SECONDS': 60})
+    def test_limited_links_skip_buffer(self):
+        models.ProfileLink.objects.filter(pk=self.link.pk).update(max_views=1)
+        with mock.patch('profile.models.profile._link_view_buffer', None):
+            models.ProfileLink.resolve(self.link.uid).record_view()
+            self.assertTrue(self.reload().is_expired)
+
+
+class CountBufferTest(TestCase):
+    def setUp(self):
+        self.written = []
+
+    def buffer(self, max_pending=3, max_age=60):
+        buffer = CountBuffer(self.written.append, max_pending, max_age)
+        self.addCleanup(buffer.flush)
+        return buffer
+
+    def test_writes_when_full(self):
+        buffer = self.buffer()
+        buffer.add('a')
+        buffer.add('b')
+        self.assertEqual(self.written, [])
+        buffer.add('a')
+        self.assertEqual(self.written, [{'a': 2, 'b': 1}])
+        buffer.add('a', 5)
+        self.assertEqual(self.written[1:], [{'a': 5}])
+
+    def test_flush(self):
+        buffer = self.buffer()
+        buffer.flush()
+        self.assertEqual(self.written, [])
+        buffer.add('a')
+        buffer.flush()
+        buffer.flush()
+        self.assertEqual(self.written, [{'a': 1}])
+
+    def test_writes_when_old(self):
+        buffer = self.buffer(max_age=0.05)
+        buffer.add('a')
+        deadline = time.monotonic() + 5
+        while not self.written and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.written, [{'a': 1}])
+
+    def test_concurrent_adds(self):
+        buffer = self.buffer(max_pending=7)
+
+        def add():
+            for _ in range(100):
+                buffer.add('a')
+
+        threads = [threading.Thread(target=add) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        buffer.flush()
+        self.assertEqual(sum(counts['a'] for counts in self.written), 800)
+
+
+class ConcurrentLinkViewTest(TransactionTestCase):
+    # sqlite's in-memory test database fails concurrent writers with "table is locked"
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_no_lost_views(self):
+        link = make_profile().links.get()
+        models.ProfileLink.objects.filter(pk=link.pk).update(max_views=1000)
+
+        def view():
+            try:
+                for _ in range(10):
+                    models.ProfileLink.resolve(link.uid).record_view()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=view) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(models.ProfileLink.objects.get(pk=link.pk).views, 80)
+
+
+class ResolveLinkTest(TestCase):
+    def setUp(self):
+        caches['links'].clear()
+        self.link = make_profile().links.get()
+
+    def test_cached(self):
+        with self.assertNumQueries(1):
+            link = models.ProfileLink.resolve(self.link.uid)
+        self.assertEqual((link.pk, link.profile_id), (self.link.pk, self.link.profile_id))
+        with self.assertNumQueries(0):
+            self.assertEqual(models.ProfileLink.resolve(self.link.uid).pk, self.link.pk)
+        models.ProfileLink.forget(self.link.uid)
+        with self.assertNumQueries(1):
+            models.ProfileLink.resolve(self.link.uid)
+
+    def test_unknown_or_expired(self):
+        self.assertIsNone(models.ProfileLink.resolve(uuid.uuid4()))
+        models.ProfileLink.objects.filter(pk=self.link.pk).update(is_expired=True)
+        self.assertIsNone(models.ProfileLink.resolve(self.link.uid))
+
+    def test_expiry_time_checked_on_cached_links(self):
+        expires = timezone.now() + dt.timedelta(minutes=1)
+        models.ProfileLink.objects.filter(pk=self.link.pk).update(expires=expires)
+        self.assertIsNotNone(models.ProfileLink.resolve(self.link.uid))
+        with mock.patch('django.utils.timezone.now', return_value=expires):
+            self.assertIsNone(models.ProfileLink.resolve(self.link.uid))
+
+    def test_view_limited_links_not_cached(self):
+        models.ProfileLink.objects.filter(pk=self.link.pk).update(max_views=5)
+        models.ProfileLink.resolve(self.link.uid)
+        with self.assertNumQueries(1):
+            self.assertEqual(models.ProfileLink.resolve(self.link.uid).max_views, 5)
+
+
+class TempMediaMixin:
+    """runs each test with MEDIA_ROOT in a new temporary directory"""
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+
+class QrCodeTest(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        caches['fragments'].clear()
+
+    def test_content_addressed(self):
+        self.assertEqual(qr.qr_key('https://example.com'), qr.qr_key('https://example.com'))
+        self.assertNotEqual(qr.qr_key('https://example.com'), qr.qr_key('https://example.org'))
+        self.assertNotEqual(qr.qr_key('https://example.com'), qr.qr_key('https://example.com', 'H'))
+
+    def test_generated_once(self):
+        key, image = qr.get_qr('https://example.com', 'png')
+        self.assertEqual(Image.open(io.BytesIO(image)).format, 'PNG')
+        self.assertTrue(default_storage.exists(f'{consts.QR_CODE_DIR}/{key}.png'))
+        with mock.patch.object(qr, 'make_qr') as make_qr:
+            self.assertEqual(qr.get_qr('https://example.com', 'png'), (key, image))
+            # from storage once the cache entry is gone
+            caches['fragments'].clear()
+            self.assertEqual(qr.get_qr('https://example.com', 'png'), (key, image))
+        make_qr.assert_not_called()
+
+    def test_view(self):
+        link = make_profile().links.get()
+        url = reverse('link_qr_svg', kwargs={'uid': link.uid})
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'image/svg+xml')
+        self.assertIn(b'<svg', response.content)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        models.ProfileLink.objects.filter(pk=link.pk).update(is_expired=True)
+        models.ProfileLink.forget(link.uid)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class OutstandingRequestTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.profile = make_profile()
+        self.user = self.profile.user
+        self.senders = [make_profile(name) for name in ('sam', 'kim', 'lee')]
+
+    def request(self, sender):
+        return models.ConnectionRequest.objects.create(profile_from=sender, profile_to=self.profile)
+
+    def assertCount(self, expected):
+        self.assertEqual(models.ConnectionRequest.outstanding_count(self.user.pk), expected)
+        self.assertEqual(models.ConnectionRequest.outstanding.filter(profile_to__user=self.user).count(), expected)
+
+    def test_cached(self):
+        self.assertCount(0)
+        self.request(self.senders[0])
+        with self.assertNumQueries(0):
+            self.assertEqual(models.ConnectionRequest.outstanding_count(self.user.pk), 1)
+
+    def test_follows_requests(self):
+        self.assertCount(0)
+        requests = [self.request(sender) for sender in self.senders]
+        self.assertCount(3)
+        requests[0].accept()
+        self.assertCount(2)
+        requests[1].decline()
+        self.assertCount(1)
+        # saving again without a status change
+        requests[0].message = 'hi'
+        requests[0].save()
+        models.ConnectionRequest.objects.get(pk=requests[2].pk).save()
+        self.assertCount(1)
+        requests[1].delete()
+        self.assertCount(1)
+        models.ConnectionRequest.objects.get(pk=requests[2].pk).delete()
+        self.assertCount(0)
+
+    def test_unknown_previous_status(self):
+        request = self.request(self.senders[0])
+        self.assertCount(1)
+        partial = models.ConnectionRequest.objects.only('profile_to').get(pk=request.pk)
+        partial.status = profile_models.RequestStatus.ACCEPTED
+        partial.save()
+        self.assertCount(0)
+
+    def test_views(self):
+        requests = [self.request(sender) for sender in self.senders[:2]]
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('connection_list')).context['connection_request_count'], 2)
+        self.client.post(reverse('connection_accept', kwargs={'request_pk': requests[0].pk}))
+        self.client.post(reverse('connection_decline', kwargs={'request_pk': requests[1].pk}))
+        self.assertEqual(self.client.get(reverse('connection_list')).context['connection_request_count'], 0)
+
+    def test_changes_page_etag(self):
+        self.client.force_login(self.user)
+        url = reverse('profile', kwargs={'profile_pk': self.profile.pk})
+        self.client.get(url)
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.request(self.senders[0])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ConnectionGraphTest(TestCase):
+    def setUp(self):
+        caches['graph'].clear()
+        self.me, self.sam, self.kim, self.lee, self.max, self.ann = (
+            make_profile(name) for name in ('me', 'sam', 'kim', 'lee', 'max', 'ann')
+        )
+        for a, b in (
+            (self.me, self.sam), (self.me, self.kim),
+            (self.sam, self.lee), (self.kim, self.lee), (self.kim, self.max),
+            (self.lee, self.ann),
+        ):
+            a.connections.add(b)
+
+    def test_mutual_connections(self):
+        self.assertEqual(set(graph.mutual_connections(self.me.user, self.lee)), {self.sam, self.kim})
+        self.assertEqual(set(graph.mutual_connections(self.me.user, self.max)), {self.kim})
+        self.assertFalse(graph.mutual_connections(AnonymousUser(), self.lee).exists())
+
+    def test_mutual_connections_follow_changes(self):
+        self.assertEqual(set(graph.mutual_connections(self.me.user, self.max)), {self.kim})
+        self.sam.connections.add(self.max)
+        self.assertEqual(set(graph.mutual_connections(self.me.user, self.max)), {self.kim, self.sam})
+        self.kim.connections.remove(self.max)
+        self.assertEqual(set(graph.mutual_connections(self.me.user, self.max)), {self.sam})
+
+    def test_reach(self):
+        self.assertEqual(graph.reach(self.me.user_id), [(self.lee.pk, 2, 2), (self.max.pk, 2, 1)])
+        self.assertEqual(graph.reach(self.me.user_id, max_depth=3)[-1], (self.ann.pk, 3, 2))
+        self.assertEqual(graph.reach(self.me.user_id, max_depth=3, limit=1), [(self.lee.pk, 2, 2)])
+        # cycles don't repeat or grow the result
+        self.ann.connections.add(self.me)
+        self.assertEqual(
+            [row[0] for row in graph.reach(self.me.user_id, max_depth=3)],
+            [self.lee.pk, self.max.pk],
+        )
+
+    def test_suggestions(self):
+        suggested = graph.suggestions(self.me.user)
+        self.assertEqual([(profile, profile.mutual_count) for profile in suggested], [(self.lee, 2), (self.max, 1)])
+
+
+class LinkSweepTest(TestCase):
+    def setUp(self):
+        self.links = [make_profile(name).links.get() for name in ('alex', 'sam', 'kim', 'lee')]
+        now = timezone.now()
+        timed_out, viewed_out, active, limited = (link.pk for link in self.links)
+        models.ProfileLink.objects.filter(pk=timed_out).update(expires=now - dt.timedelta(seconds=1))
+        models.ProfileLink.objects.filter(pk=viewed_out).update(max_views=2, views=2)
+        models.ProfileLink.objects.filter(pk=active).update(expires=now + dt.timedelta(hours=1))
+        models.ProfileLink.objects.filter(pk=limited).update(max_views=3, views=2)
+
+    def expired(self):
+        return [link.is_expired for link in models.ProfileLink.objects.order_by('pk')]
+
+    def test_expire_due(self):
+        self.assertEqual(models.ProfileLink.expire_due(), 2)
+        self.assertEqual(self.expired(), [True, True, False, False])
+        self.assertEqual(models.ProfileLink.expire_due(), 0)
+        self.assertEqual(models.ProfileLink.expire_due(now=timezone.now() + dt.timedelta(hours=2)), 1)
+        self.assertEqual(self.expired(), [True, True, True, False])
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('expire_links', stdout=out)
+        self.assertIn('expired 2 links', out.getvalue())
+        self.assertEqual(tasks.sweep_links()['flipped'], 0)
+
+    def test_periodic_task(self):
+        # run_once closes the calling thread's connections, so not on the test's
+        failing = threading.Thread(target=PeriodicTask(lambda: 1 / 0, 60, name='failing').run_once)
+        with self.assertLogs('profile.utils.scheduler', 'ERROR'):
+            failing.start()
+            failing.join()
+        calls = []
+        task = PeriodicTask(lambda: calls.append(1), 0.01, name='counting')
+        task.start()
+        deadline = time.monotonic() + 5
+        while len(calls) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        task.stop()
+        self.assertGreaterEqual(len(calls), 3)
+
+
+def png_bytes(size=(40, 30)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class ThumbnailNameTest(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(tasks._pending_thumbnails.clear)
+
+    def existing(self, photo):
+        return [
+            thumbnails.existing_thumbnail(photo, geometry, **consts.PROFILE_PHOTO_THUMBNAIL_OPTIONS)
+            for geometry in consts.PROFILE_PHOTO_THUMBNAIL_SIZES
+        ]
+
+    def test_matches_get_thumbnail(self):
+        # existing_thumbnail mirrors sorl's private option defaults, names must agree
+        for name, body in (('me.png', png_bytes((300, 200))), ('me.jpg', image_bytes((300, 200)))):
+            with self.subTest(name=name):
+                photo = ImageFile(default_storage.save(name, ContentFile(body)), default_storage)
+                self.assertEqual(self.existing(photo), [None] * len(consts.PROFILE_PHOTO_THUMBNAIL_SIZES))
+                tasks.generate_thumbnails(photo.name)
+                for geometry, thumbnail in zip(consts.PROFILE_PHOTO_THUMBNAIL_SIZES, self.existing(photo)):
+                    self.assertIsNotNone(thumbnail, geometry)
+                    self.assertEqual(
+                        thumbnail.name,
+                        get_thumbnail(photo, geometry, **consts.PROFILE_PHOTO_THUMBNAIL_OPTIONS).name,
+                    )
+
+    def test_template_tag(self):
+        profile = make_profile()
+        profile.photo.save('me.png', ContentFile(png_bytes((300, 200))))
+        with mock.patch.object(tasks, 'enqueue_thumbnails') as enqueue_thumbnails:
+            self.assertTrue(profile_extras.profile_thumbnail(profile.photo, '60x60').is_original)
+        enqueue_thumbnails.assert_called_once_with(profile.photo.name)
+        tasks.generate_thumbnails(profile.photo.name)
+        thumbnail = profile_extras.profile_thumbnail(profile.photo, '60x60')
+        self.assertFalse(getattr(thumbnail, 'is_original', False))
+        self.assertEqual((thumbnail.width, thumbnail.height), (60, 60))
+
+
+def image_bytes(size=(40, 30), format='JPEG', mode='RGB', color='red', **save_options) -> bytes:
+    buffer = io.BytesIO()
+    Image.new(mode, size, color).save(buffer, format, **save_options)
+    return buffer.getvalue()
+
+
+class ImagesTest(TestCase):
+    def test_check_image(self):
+        upload = io.BytesIO(png_bytes())
+        images.check_image(upload)
+        # left where it was for the upload to be saved
+        self.assertEqual(upload.tell(), 0)
+        for body in (b'', b'not an image', png_bytes()[:40]):
+            with self.subTest(body=body[:12]), self.assertRaises(ValidationError):
+                images.check_image(io.BytesIO(body))
+
+    def test_check_image_pixels(self):
+        with mock.patch.object(consts, 'IMAGE_UPLOAD_MAX_PIXELS', 40 * 30 - 1):
+            with self.assertRaisesMessage(ValidationError, 'The image is 40x30'):
+                images.check_image(io.BytesIO(png_bytes()))
+
+    def open(self, result):
+        content, extension = result
+        self.assertEqual(extension, images.output_extension('WEBP'))
+        return Image.open(io.BytesIO(content))
+
+    def test_normalize(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # orientation, rotated 90 degrees
+        exif[0x010F] = 'Camera'
+        img = self.open(images.normalize(io.BytesIO(image_bytes((400, 100), exif=exif)), 100))
+        # upright and fit in 100x100
+        self.assertEqual(img.size, (25, 100))
+        self.assertEqual(img.format, images.output_format('WEBP'))
+        self.assertFalse(img.getexif())
+
+    def test_normalize_small_image_kept_size(self):
+        self.assertEqual(self.open(images.normalize(io.BytesIO(png_bytes()), 100)).size, (40, 30))
+
+    def test_normalize_alpha(self):
+        body = image_bytes(format='PNG', mode='RGBA', color=(255, 0, 0, 128))
+        self.assertEqual(self.open(images.normalize(io.BytesIO(body), 100)).mode, 'RGBA')
+        content, extension = images.normalize(io.BytesIO(body), 100, 'JPEG')
+        self.assertEqual((extension, Image.open(io.BytesIO(content)).mode), ('.jpg', 'RGB'))
+
+    def test_normalize_animated(self):
+        frames = [Image.new('RGB', (40, 30), color) for color in ('red', 'blue')]
+        buffer = io.BytesIO()
+        frames[0].save(buffer, 'GIF', save_all=True, append_images=frames[1:])
+        self.assertIsNone(images.normalize(io.BytesIO(buffer.getvalue()), 100))
+        buffer.seek(0)
+        self.assertEqual(self.open(images.normalize(buffer, 100, keep_animated=False)).size, (40, 30))
+
+
+@override_settings(PROFILE_IMAGE_NORMALIZATION={'MAX_SIZE': 100})
+class ProcessPhotoTest(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(tasks._pending_thumbnails.clear)
+        self.profile = make_profile()
+        self.profile.photo.save('me.jpg', ContentFile(image_bytes((400, 300))))
+        self.name = self.profile.photo.name
+
+    def photo(self):
+        return models.Profile.objects.get(pk=self.profile.pk).photo
+
+    def assertThumbnails(self, photo):
+        for geometry in consts.PROFILE_PHOTO_THUMBNAIL_SIZES:
+            self.assertIsNotNone(
+                thumbnails.existing_thumbnail(photo, geometry, **consts.PROFILE_PHOTO_THUMBNAIL_OPTIONS),
+            )
+
+    def test_process_photo(self):
+        metrics = tasks.process_photo(self.profile.pk, self.name)
+        photo = self.photo()
+        self.assertEqual(photo.name, metrics['name'])
+        self.assertNotEqual(photo.name, self.name)
+        self.assertEqual(Image.open(photo).size, (100, 75))
+        self.assertFalse(default_storage.exists(self.name))
+        self.assertThumbnails(photo)
+        self.assertEqual(tasks._pending_thumbnails, set())
+
+    def test_failed_normalization_keeps_original(self):
+        with mock.patch.object(images, 'normalize', side_effect=OSError('bad exif')):
+            with self.assertLogs('profile.tasks', 'ERROR'):
+                self.assertIsNone(tasks.process_photo(self.profile.pk, self.name))
+        self.assertEqual(self.photo().name, self.name)
+        self.assertThumbnails(self.photo())
+        self.assertEqual(tasks._pending_thumbnails, set())
+
+    def test_names_claimed_while_running(self):
+        pending = []
+        with mock.patch.object(tasks, 'generate_thumbnails', side_effect=lambda name: pending.append(
+            set(tasks._pending_thumbnails)
+        )):
+            with mock.patch.object(tasks.image_pool, 'submit') as submit:
+                with self.captureOnCommitCallbacks(execute=True):
+                    tasks.enqueue_photo(self.profile)
+                    # the template fallback while the photo is queued
+                    tasks.enqueue_thumbnails(self.name)
+            submit.assert_called_once_with(tasks.process_photo, self.profile.pk, self.name)
+            tasks.process_photo(self.profile.pk, self.name)
+        self.assertEqual(pending, [{self.name, self.photo().name}])
+        self.assertEqual(tasks._pending_thumbnails, set())
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """answers like the remote hosts image attachments point to"""
+    failures_left = 0
+    # Host headers of the requests received
+    hosts = []
+
+    def log_message(self, *args):
+        pass
+
+    def handle_one_request(self):
+        try:
+            super().handle_one_request()
+        except (BrokenPipeError, ConnectionResetError):
+            # the client gave up on a slow or large response
+            self.close_connection = True
+
+    def send_image_headers(self, length=None):
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        if length is not None:
+            self.send_header('Content-Length', str(length))
+        self.end_headers()
+
+    def do_GET(self):
+        StandInHandler.hosts.append(self.headers['Host'])
+        body = png_bytes()
+        if self.path == '/image.png':
+            self.send_image_headers(len(body))
+            self.wfile.write(body)
+        elif self.path == '/flaky.png':
+            if StandInHandler.failures_left:
+                StandInHandler.failures_left -= 1
+                self.send_error(503)
+            else:
+                self.send_image_headers(len(body))
+                self.wfile.write(body)
+        elif self.path == '/slow.png':
+            # trickles bytes, never slow enough for a socket timeout
+            self.send_image_headers()
+            for _ in range(30):
+                self.wfile.write(b'x')
+                self.wfile.flush()
+                time.sleep(0.05)
+        elif self.path == '/large.png':
+            self.send_image_headers()
+            for _ in range(16):
+                self.wfile.write(b'x' * 1024)
+        elif self.path == '/text':
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.end_headers()
+            self.wfile.write(b'<html></html>')
+        else:
+            self.send_error(404)
+
+
+class RemoteStandInMixin:
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            PROFILE_REMOTE_IMAGES={
+                'ALLOW_PRIVATE_HOSTS': True,
+                'TIMEOUT': 0.5,
+                'MAX_BYTES': 8 * 1024,
+                'BACKOFF': 0.05,
+            },
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+        super().tearDown()
+
+
+class RemoteFetchTest(RemoteStandInMixin, TestCase):
+    def test_fetches_and_normalizes(self):
+        content = remote.fetch(f'{self.base_url}/image.png')
+        with Image.open(io.BytesIO(content)) as image:
+            self.assertEqual(image.format, 'WEBP')
+
+    def test_deadline_stops_trickling_host(self):
+        started = time.monotonic()
+        with self.assertRaisesMessage(remote.RemoteImageError, 'timed out'):
+            remote.fetch(f'{self.base_url}/slow.png')
+        self.assertLess(time.monotonic() - started, 1.2)
+
+    def test_size_cap(self):
+        with self.assertRaisesMessage(remote.RemoteImageError, 'too large'):
+            remote.fetch(f'{self.base_url}/large.png')
+
+    def test_rejects_other_content(self):
+        with self.assertRaisesMessage(remote.RemoteImageError, 'not an image'):
+            remote.fetch(f'{self.base_url}/text')
+
+    def test_refuses_private_hosts(self):
+        with override_settings(PROFILE_REMOTE_IMAGES={'ALLOW_PRIVATE_HOSTS': False}):
+            with self.assertRaisesMessage(remote.RemoteImageError, 'not a public host'):
+                remote.fetch(f'{self.base_url}/image.png')
+
+    def test_connects_to_the_checked_address(self):
+        # images.invalid never resolves, the request can only reach the
+        # stand-in through the address the check returned
+        port = self.server.server_address[1]
+        with mock.patch.object(remote, 'resolve', return_value=['127.0.0.1']) as resolve:
+            remote.fetch(f'http://images.invalid:{port}/image.png')
+        self.assertEqual(resolve.call_count, 1)
+        self.assertEqual(StandInHandler.hosts[-1], f'images.invalid:{port}')
+
+    def test_refuses_host_with_any_private_address(self):
+        addresses = ['93.184.215.14', '10.0.0.1']
+        with override_settings(PROFILE_REMOTE_IMAGES={'ALLOW_PRIVATE_HOSTS': False}):
+            with mock.patch.object(remote, 'resolve', return_value=addresses):
+                with self.assertRaisesMessage(remote.RemoteImageError, 'not a public host'):
+                    remote.fetch('http://images.invalid/image.png')
+
+    def test_backoff_doubles(self):
+        url = f'{self.base_url}/missing.png'
+        first = remote.record_failure(url, 'error')
+        second = remote.record_failure(url, 'error')
+        self.assertTrue(remote.backing_off(url))
+        self.assertEqual(second['failures'], 2)
+        self.assertGreater(second['retry_at'] - first['retry_at'], 0.04)
+
+
+class RemoteRetryTest(RemoteStandInMixin, TransactionTestCase):
+    def tearDown(self):
+        with tasks._pending_lock:
+            timers = list(tasks._remote_retries.values())
+            tasks._remote_retries.clear()
+        for timer in timers:
+            timer.cancel()
+        super().tearDown()
+
+    def test_failure_is_retried_without_a_render(self):
+        url = f'{self.base_url}/flaky.png'
+        StandInHandler.failures_left = 2
+        self.assertIsNone(tasks.fetch_remote_image(url))
+        self.assertIn(url, tasks._remote_retries)
+        self.assertTrue(remote.backing_off(url))
+
+        storage = models.Attachment._meta.get_field('file').storage
+        deadline = time.monotonic() + 5
+        while not storage.exists(remote.local_name(url)) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertTrue(storage.exists(remote.local_name(url)))
+        self.assertEqual(StandInHandler.failures_left, 0)
+        self.assertFalse(remote.backing_off(url))
+
+    def test_gives_up_after_max_retries(self):
+        url = f'{self.base_url}/missing.png'
+        failure = {'failures': remote.remote_images_config()['MAX_RETRIES'] + 1, 'retry_at': time.time()}
+        tasks.schedule_remote_retry(url, failure)
+        self.assertNotIn(url, tasks._remote_retries)
+
+
+class SearchTest(TestCase):
+    def setUp(self):
+        self.profile = make_profile()
+        self.user = self.profile.user
+        self.job = models.WorkExperience.objects.get(user=self.user)
+
+    def labels(self, query):
+        return [entry.label for entry in search.search_items(self.user, query)]
+
+    def test_fts5_query(self):
+        self.assertEqual(search.fts5_query('web dev'), '"web"* "dev"*')
+        self.assertEqual(search.fts5_query('"x" OR (y* -'), '"x"* "OR"* "y"*')
+        self.assertEqual(search.fts5_query('*:^"'), '')
+
+    def test_tsquery(self):
+        self.assertEqual(search.tsquery('web dev'), 'web:* & dev:*')
+        self.assertEqual(search.tsquery("a' | !b:*"), 'a:* & b:*')
+        self.assertEqual(search.tsquery('&|!'), '')
+
+    def test_prefix_match(self):
+        self.assertEqual(self.labels('devel'), ['Developer'])
+        self.assertEqual(self.labels('djan'), ['Django'])
+        self.assertEqual(self.labels('dev org'), ['Developer'])
+        self.assertEqual(self.labels('dev django'), [])
+
+    def test_odd_input(self):
+        for query in ('', '   ', '"', '*:^', 'AND', 'NEAR(', 'dev"*', "dev'&", 'the', 'a_b', 'café'):
+            list(search.search_items(self.user, query))
+        self.assertEqual(self.labels(''), [])
+        self.assertEqual(self.labels('"*'), [])
+
+    def test_ranked_by_weight(self):
+        # the label is weighted above the organization, which is above the description
+        models.WorkExperience.objects.create(
+            user=self.user, label='Consultant', organization='Python Shop', date=dt.date(2021, 1, 1),
+        )
+        models.WorkExperience.objects.create(
+            user=self.user, label='Trainer', organization='School', date=dt.date(2022, 1, 1), description='python',
+        )
+        models.Skill.objects.create(user=self.user, label='Python')
+        self.assertEqual(self.labels('python'), ['Python', 'Consultant', 'Trainer'])
+        entries = search.search_items(self.user, 'python')
+        self.assertGreater(entries[0].rank, entries[1].rank)
+
+    def test_follows_edits(self):
+        self.job.label = 'Architect'
+        self.job.save()
+        self.assertEqual(self.labels('devel'), [])
+        self.assertEqual(self.labels('archi'), ['Architect'])
+        self.job.delete()
+        self.assertEqual(self.labels('archi'), [])
+
+    def test_only_own_items(self):
+        other = make_profile('sam')
+        self.assertEqual(len(search.search_items(other.user, 'devel')), 1)
+        self.assertEqual(self.labels('sam'), [])
+
+    def test_search_profiles(self):
+        make_profile('sam')
+        self.assertEqual(list(search.search_profiles(self.user, 'hel alex')), [self.profile])
+        self.assertEqual(list(search.search_profiles(self.user, 'nobody')), [])
+        self.assertEqual(list(search.search_profiles(self.user, '*')), [])
+
+    def test_view(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('search'), {'q': 'devel'})
+        self.assertContains(response, 'Developer')
+        self.assertNotContains(response, 'Django')
@@ -5,6 +5,7 @@ from . import views
 urlpatterns = [
     path('', views.profile_list, name='profile_list'),
     path('new/', views.ProfileCreateUpdateView.as_view(), {'next': 'profile'}, name='profile_create'),
+    path('import/', views.profile_import, name='profile_import'),
     path('content/order/', views.ContentOrderView.as_view(), name='content_order'),
     path('content/<int:related_content_pk>/order', views.ContentOrderView.as_view(), name='attachment_order'),
     path(
@@ -20,6 +21,7 @@ urlpatterns = [
             path('', views.profile, name='profile'),
             path('edit/', views.ProfileCreateUpdateView.as_view(), {'next': 'profile'}, name='profile_edit'),
             path('delete/', views.profile_delete, name='profile_delete'),
+            path('vcf/', views.profile_vcard, name='profile_vcard'),
             path('select/', views.ProfileSelectContentView.as_view(), name='profile_content_select', ),
             path('editdetail/', views.ProfileDetailEditView.as_view(), name='profile_detail_edit'),
             path('img/', views.update_profile_img, name='update_profile_img'),
@@ -0,0 +1,79 @@
+import threading
+
+from django.core.cache import caches
+
+
+FRAGMENT_CACHE = 'fragments'
+LINK_CACHE = 'links'
+GRAPH_CACHE = 'graph'
+
+
+class RenderCache:
+    """
+    Caches rendered html of single items.
+    Entries are keyed by model and pk and store the item's `updated`
+    timestamp, so an entry rendered before the item's last save is
+    treated as a miss even if invalidation was skipped (e.g. queryset.update()).
+    The backend is whichever cache is configured under `alias` in settings.CACHES.
+    """
+    def __init__(self, alias: str = FRAGMENT_CACHE):
+        self.alias = alias
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def key(obj) -> str:
+        # proxies render the same as their concrete model
+        return f'render:{obj._meta.concrete_model._meta.label_lower}:{obj.pk}'
+
+    @staticmethod
+    def stamp(obj) -> float | None:
+        updated = getattr(obj, 'updated', None)
+        return updated.timestamp() if updated else None
+
+    def get_or_render(self, obj, render) -> str:
+        if obj.pk is None:
+            return render()
+        key = self.key(obj)
+        stamp = self.stamp(obj)
+        cached = self.cache.get(key)
+        if cached is not None and stamp is not None and cached[0] == stamp:
+            self._count(hit=True)
+            return cached[1]
+        self._count(hit=False)
+        html = render()
+        self.cache.set(key, (stamp, html))
+        return html
+
+    def invalidate(self, obj):
+        self.cache.delete(self.key(obj))
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> dict:
+        """hit and miss counts for this process since start up or the last reset"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else None,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+render_cache = RenderCache()
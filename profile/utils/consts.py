@@ -5,6 +5,23 @@ from dataclasses import dataclass
 
 PROFILE_PHOTO_DIR = os.path.join('users', 'profile', 'photo')
 ATTACHMENT_MODEL_DIR = os.path.join('users', 'models', 'attachment')
+# local copies of images attached by url
+REMOTE_IMAGE_DIR = os.path.join('users', 'models', 'attachment', 'remote')
+QR_CODE_DIR = os.path.join('qr')
+QR_CODE_MAX_AGE = 60 * 60 * 24 * 365
+
+# every size profile photos are shown at, generated when a photo is uploaded
+PROFILE_PHOTO_THUMBNAIL_SIZES = ('200x200', '100x100', '60x60')
+PROFILE_PHOTO_THUMBNAIL_OPTIONS = {'crop': 'center'}
+ATTACHMENT_THUMBNAIL_SIZE = '200x200'
+# larger uploads are rejected before they are decoded
+IMAGE_UPLOAD_MAX_PIXELS = 40_000_000
+
+VCARD_CONTENT_TYPE = 'text/vcard; charset=utf-8'
+# profiles read per query by the streaming vcard export
+VCARD_EXPORT_CHUNK_SIZE = 500
+# valid cards written per transaction by the vcard import
+VCARD_IMPORT_CHUNK_SIZE = 500
 
 CONTENT_TYPES = (
     'email',
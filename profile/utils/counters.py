@@ -0,0 +1,64 @@
+import time
+import atexit
+import threading
+from collections import Counter
+
+from django.db import connections
+
+
+class CountBuffer:
+    """
+    Aggregates increments in process and hands them to `write` in batches.
+    Pending counts are written once `max_pending` increments are buffered
+    or `max_age` seconds after the first buffered increment, whichever is
+    first, and when the process exits.
+    Counts buffered in a process that is killed are lost.
+    """
+    def __init__(self, write, max_pending: int, max_age: float):
+        self.write = write
+        self.max_pending = max_pending
+        self.max_age = max_age
+        self._counts = Counter()
+        self._pending = 0
+        self._since = None
+        self._timer = None
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def add(self, key, count: int = 1):
+        with self._lock:
+            self._counts[key] += count
+            self._pending += count
+            if self._since is None:
+                self._since = time.monotonic()
+                self._start_timer()
+            due = (
+                self._pending >= self.max_pending
+                or time.monotonic() - self._since >= self.max_age
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            counts = self._counts
+            self._counts = Counter()
+            self._pending = 0
+            self._since = None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if counts:
+            self.write(dict(counts))
+
+    def _start_timer(self):
+        self._timer = threading.Timer(self.max_age, self._flush_from_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        finally:
+            # the timer thread opened its own connection
+            connections.close_all()
@@ -0,0 +1,108 @@
+from django.conf import settings
+from django.db import connections
+from django.core.cache import caches
+
+from profile import models
+from .cache import GRAPH_CACHE
+
+# connections further away than this are never followed
+MAX_DEPTH = 3
+
+
+def graph_cache():
+    """the adjacency cache, None when settings.CACHES has no GRAPH_CACHE alias"""
+    return caches[GRAPH_CACHE] if GRAPH_CACHE in settings.CACHES else None
+
+
+def adjacency_key(user_id: int) -> str:
+    return f'graph:adj:{user_id}'
+
+
+def adjacency(user_id: int) -> dict[int, set[int]]:
+    """{profile pk: pks of the profiles it's connected to} for the user's connected profiles"""
+    cache = graph_cache()
+    if cache is not None:
+        adj = cache.get(adjacency_key(user_id))
+        if adj is not None:
+            return adj
+
+    adj = {}
+    for profile_from_id, profile_to_id in (
+        models.Connection.objects
+        .filter(profile_from__user_id=user_id)
+        .order_by()
+        .values_list('profile_from_id', 'profile_to_id')
+    ):
+        adj.setdefault(profile_from_id, set()).add(profile_to_id)
+
+    if cache is not None:
+        cache.set(adjacency_key(user_id), adj)
+    return adj
+
+
+def forget(user_ids):
+    cache = graph_cache()
+    if cache is not None:
+        cache.delete_many([adjacency_key(user_id) for user_id in user_ids])
+
+
+def connected_ids(user_id: int) -> set[int]:
+    """pks of every profile connected to any of the user's profiles"""
+    return set().union(*adjacency(user_id).values())
+
+
+def mutual_connections(user, profile):
+    """profiles connected both to one of `user`'s profiles and to `profile`"""
+    if not user.is_authenticated:
+        return models.Profile.objects.none()
+    ids = connected_ids(user.pk) & adjacency(profile.user_id).get(profile.pk, set())
+    return models.Profile.objects.filter(pk__in=ids).exclude(user=user)
+
+
+def reach(user_id: int, max_depth: int = 2, limit: int = 20) -> list[tuple[int, int, int]]:
+    """
+    (profile pk, distance, number of the user's connections it's reached through)
+    for profiles at least 2 connections away from the user's profiles, at most
+    `max_depth` away, closest and best connected first.
+    Walks Connection with one bounded recursive query, UNION drops repeated
+    (profile, first hop, depth) rows so cycles can't grow the result.
+    """
+    max_depth = min(max_depth, MAX_DEPTH)
+    connection_table = models.Connection._meta.db_table
+    profile_table = models.Profile._meta.db_table
+    sql = f'''
+        WITH RECURSIVE reach(profile_id, via, depth) AS (
+            SELECT c.profile_to_id, c.profile_to_id, 1
+            FROM {connection_table} c
+            WHERE c.profile_from_id IN (SELECT id FROM {profile_table} WHERE user_id = %s)
+            UNION
+            SELECT c.profile_to_id, r.via, r.depth + 1
+            FROM reach r
+            JOIN {connection_table} c ON c.profile_from_id = r.profile_id
+            WHERE r.depth < %s
+        )
+        SELECT r.profile_id, MIN(r.depth), COUNT(DISTINCT r.via)
+        FROM reach r
+        JOIN {profile_table} p ON p.id = r.profile_id
+        WHERE p.user_id <> %s
+        GROUP BY r.profile_id
+        HAVING MIN(r.depth) > 1
+        ORDER BY MIN(r.depth), COUNT(DISTINCT r.via) DESC, r.profile_id
+        LIMIT %s
+    '''
+    with connections[models.Connection.objects.db].cursor() as cursor:
+        cursor.execute(sql, [user_id, max_depth, user_id, limit])
+        return cursor.fetchall()
+
+
+def suggestions(user, max_depth: int = 2, limit: int = 20) -> list:
+    """profiles connected to the user's connections, each with `mutual_count` set"""
+    rows = reach(user.pk, max_depth, limit)
+    profiles = models.Profile.objects.in_bulk([profile_id for profile_id, depth, via in rows])
+    result = []
+    for profile_id, depth, via in rows:
+        if profile_id in profiles:
+            profile = profiles[profile_id]
+            profile.mutual_count = via
+            result.append(profile)
+    return result
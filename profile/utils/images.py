@@ -0,0 +1,97 @@
+import io
+import os
+
+from PIL import Image, ImageOps, features
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+from . import consts
+
+# see settings.PROFILE_IMAGE_NORMALIZATION
+DEFAULT_NORMALIZATION = {
+    'MAX_SIZE': 2048,
+    'FORMAT': 'WEBP',
+    'QUALITY': 82,
+    'KEEP_ORIGINAL': False,
+}
+EXTENSIONS = {
+    'WEBP': '.webp',
+    'JPEG': '.jpg',
+    'PNG': '.png',
+}
+
+
+def normalization_config() -> dict | None:
+    """settings.PROFILE_IMAGE_NORMALIZATION over the defaults, None when turned off"""
+    config = getattr(settings, 'PROFILE_IMAGE_NORMALIZATION', {})
+    if config is None:
+        return None
+    return {**DEFAULT_NORMALIZATION, **config}
+
+
+def check_image(file_):
+    """
+    Raises ValidationError unless `file_` is an image Pillow can read
+    within consts.IMAGE_UPLOAD_MAX_PIXELS. Only the header is decoded.
+    """
+    position = file_.tell() if hasattr(file_, 'tell') else None
+    try:
+        with Image.open(file_) as img:
+            width, height = img.size
+            img.verify()
+    except Exception:
+        raise ValidationError('Upload a valid image. The file is either not an image or corrupted.')
+    finally:
+        if position is not None:
+            file_.seek(position)
+    if width * height > consts.IMAGE_UPLOAD_MAX_PIXELS:
+        raise ValidationError(
+            f'The image is {width}x{height}, '
+            f'images can have at most {consts.IMAGE_UPLOAD_MAX_PIXELS // 1_000_000} megapixels.'
+        )
+
+
+def output_format(format: str) -> str:
+    """`format`, or JPEG when Pillow was built without WebP support"""
+    if format == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return format
+
+
+def output_extension(format: str) -> str:
+    format = output_format(format)
+    return EXTENSIONS.get(format, f'.{format.lower()}')
+
+
+def normalize(
+    file_, max_size: int, format: str = 'WEBP', quality: int = 82, keep_animated: bool = True,
+) -> tuple[bytes, str] | None:
+    """
+    (encoded bytes, file extension) of an image rotated upright from its
+    EXIF orientation, downscaled to fit `max_size` and re-encoded without
+    metadata. Animated images give None and are kept as they are, unless
+    `keep_animated` is off, then their first frame is used.
+    """
+    format = output_format(format)
+    with Image.open(file_) as img:
+        if getattr(img, 'is_animated', False) and keep_animated:
+            return None
+        # jpegs decode straight at the nearest scale above max_size
+        img.draft('RGB', (max_size, max_size))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_size, max_size), Image.LANCZOS)
+
+        has_alpha = img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info
+        if format == 'JPEG' or not has_alpha:
+            img = img.convert('RGB')
+        else:
+            img = img.convert('RGBA')
+
+        out = io.BytesIO()
+        # only pixels are written, exif, icc and xmp data are dropped
+        img.save(out, format=format, quality=quality, optimize=True)
+    return out.getvalue(), output_extension(format)
+
+
+def normalized_name(name: str, extension: str) -> str:
+    return f'{os.path.splitext(name)[0]}{extension}'
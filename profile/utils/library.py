@@ -0,0 +1,123 @@
+import functools
+from collections import defaultdict
+
+from django.apps import apps
+from django.db import models
+from django.core.paginator import Paginator
+
+from . import consts
+
+
+def category_kinds(categories=None) -> list[tuple[str, str, type]]:
+    """
+    (category, model name, model) for every model in consts.CONTENT_CATEGORIES,
+    optionally limited to the given categories, in display order
+    """
+    kinds = []
+    for category, mods in consts.CONTENT_CATEGORIES.items():
+        if categories and category not in categories:
+            continue
+        for mod_name in mods:
+            mn = ''.join(d.lower() for d in mod_name.split(' '))
+            kinds.append((category, mod_name, apps.get_model(app_label='profile', model_name=mn)))
+    return kinds
+
+
+def content_type_kinds() -> list[tuple[None, str, type]]:
+    """(None, content type, model) for every model in consts.CONTENT_TYPES"""
+    return [
+        (None, content_type, apps.get_model(app_label='profile', model_name=content_type))
+        for content_type in consts.CONTENT_TYPES
+    ]
+
+
+@functools.cache
+def item_category(model) -> str:
+    """category in consts.CONTENT_CATEGORIES of an item model, proxies share their concrete model's"""
+    concrete = model._meta.concrete_model
+    for category, name, mod in category_kinds():
+        if mod._meta.concrete_model is concrete:
+            return category
+    return ''
+
+
+class ItemLibrary:
+    """
+    All of a user's items across item models.
+    Listing uses a single UNION ALL of (kind, pk, label, updated) rows, one
+    SELECT per model, and full objects are only fetched for the rows shown,
+    with one query per model present on the page.
+    `kinds` is a list of (category, name, model) as returned by `category_kinds`.
+    """
+    related = (
+        'content_related__profile',
+        'subcontent_related__content__profile',
+    )
+
+    def __init__(self, user, kinds: list[tuple]):
+        self.user = user
+        self.kinds = kinds
+
+    def _querysets(self):
+        for index, (category, name, model) in enumerate(self.kinds):
+            yield model.objects.filter(user=self.user).order_by().annotate(
+                kind=models.Value(index, output_field=models.IntegerField()),
+            )
+
+    def rows(self):
+        """lightweight rows ordered by kind, then most recently updated first"""
+        querysets = [qs.values('kind', 'pk', 'label', 'updated') for qs in self._querysets()]
+        if not querysets:
+            return []
+        return querysets[0].union(*querysets[1:], all=True).order_by('kind', '-updated', '-pk')
+
+    def counts(self) -> dict[str, int]:
+        """number of items per kind name, kinds without items are left out"""
+        querysets = [
+            qs.values('kind').annotate(n=models.Count('pk')).values('kind', 'n')
+            for qs in self._querysets()
+        ]
+        if not querysets:
+            return {}
+        return {
+            self.kinds[kind][1]: n
+            for kind, n in querysets[0].union(*querysets[1:], all=True)
+            .values_list('kind', 'n')
+            if n
+        }
+
+    def page(self, number, per_page: int = 25):
+        return Paginator(self.rows(), per_page).get_page(number)
+
+    def _objects(self, rows) -> dict:
+        pks = defaultdict(list)
+        for row in rows:
+            pks[row['kind']].append(row['pk'])
+
+        objs = {}
+        for kind, kind_pks in pks.items():
+            model = self.kinds[kind][2]
+            select = [
+                f.name for f in model._meta.concrete_fields
+                if f.many_to_one and f.name != 'user'
+            ]
+            qs = model.objects.filter(pk__in=kind_pks).select_related(*select).prefetch_related(*self.related)
+            for obj in qs:
+                objs[kind, obj.pk] = obj
+        return objs
+
+    def hydrate(self, rows) -> list:
+        """full objects for `rows`, in the same order"""
+        objs = self._objects(rows)
+        return [objs[key] for key in ((row['kind'], row['pk']) for row in rows) if key in objs]
+
+    def grouped(self, rows) -> dict:
+        """{category: {name: [objects]}} for `rows`, the layout the templates use"""
+        objs = self._objects(rows)
+        grouped = {}
+        for row in rows:
+            obj = objs.get((row['kind'], row['pk']))
+            if obj is not None:
+                category, name, model = self.kinds[row['kind']]
+                grouped.setdefault(category, {}).setdefault(name, []).append(obj)
+        return grouped
@@ -0,0 +1,50 @@
+import html
+import re
+
+import markdown
+from markdown.extensions import Extension
+from markdown.treeprocessors import Treeprocessor
+
+# link and image urls with other schemes, like javascript:, are dropped
+SAFE_URL_SCHEMES = ('', 'http', 'https', 'mailto', 'tel')
+
+
+# browsers drop ascii whitespace and control characters inside a url scheme
+IGNORED_URL_CHARS_RE = re.compile(r'[\x00-\x20\x7f]')
+
+
+def url_scheme(value: str) -> str:
+    """
+    Lowercased scheme of an href or src as a browser reads it, '' for
+    relative urls. Markdown keeps character references in attributes as
+    written, so they are decoded first: &#106;avascript: is javascript:.
+    """
+    value = IGNORED_URL_CHARS_RE.sub('', html.unescape(value))
+    scheme, colon, _ = value.partition(':')
+    if not colon or any(c in scheme for c in '/?#'):
+        return ''
+    return scheme.lower()
+
+
+class SafeUrlTreeprocessor(Treeprocessor):
+    def run(self, root):
+        for element in root.iter():
+            for attr in ('href', 'src'):
+                value = element.get(attr)
+                if value is not None and url_scheme(value) not in SAFE_URL_SCHEMES:
+                    del element.attrib[attr]
+
+
+class SafeExtension(Extension):
+    """markdown without raw html, which is escaped like any other text, and without unsafe urls"""
+    def extendMarkdown(self, md):
+        md.preprocessors.deregister('html_block')
+        md.inlinePatterns.deregister('html')
+        md.treeprocessors.register(SafeUrlTreeprocessor(md), 'safe_url', -10)
+
+
+def render_markdown(text: str) -> str:
+    """user markdown as html that is safe to show as is, single newlines become <br>"""
+    if not text:
+        return ''
+    return markdown.markdown(text, extensions=[SafeExtension(), 'nl2br'])
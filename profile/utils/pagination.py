@@ -0,0 +1,60 @@
+import datetime as dt
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+EPOCH = dt.datetime(1970, 1, 1, tzinfo=dt.timezone.utc)
+
+
+class KeysetPage:
+    """
+    One page of a queryset ordered by a datetime field descending, then pk.
+    Pages are found by filtering on the last row of the previous page
+    (the cursor) instead of OFFSET, so every page costs the same however
+    far down it is.
+    """
+    def __init__(self, qs, field: str, cursor: str | None = None, per_page: int = 25):
+        self.field = field
+        self.per_page = per_page
+        qs = qs.order_by(f'-{field}', '-pk')
+        after = self.parse_cursor(cursor)
+        if after is not None:
+            value, pk = after
+            qs = qs.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}))
+        # one extra row tells whether there's a next page
+        rows = list(qs[:per_page + 1])
+        self.object_list = rows[:per_page]
+        self.has_next = len(rows) > per_page
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def next_cursor(self) -> str | None:
+        if not self.has_next:
+            return None
+        last = self.object_list[-1]
+        value = getattr(last, self.field)
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value, dt.timezone.utc)
+        # integer microseconds, url safe and exact
+        return f'{(value - EPOCH) // dt.timedelta(microseconds=1)}_{last.pk}'
+
+    @staticmethod
+    def parse_cursor(cursor: str | None):
+        """(datetime, pk) or None for a missing or malformed cursor"""
+        if not cursor:
+            return None
+        micros, _, pk = cursor.partition('_')
+        try:
+            value = EPOCH + dt.timedelta(microseconds=int(micros))
+            pk = int(pk)
+        except (ValueError, OverflowError):
+            return None
+        if not settings.USE_TZ:
+            value = timezone.make_naive(value, dt.timezone.utc)
+        return value, pk
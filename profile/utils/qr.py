@@ -0,0 +1,71 @@
+import os.path
+import hashlib
+from io import BytesIO
+
+import qrcode
+import qrcode.image.svg
+from qrcode.image.pil import PilImage
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from . import consts
+from .cache import FRAGMENT_CACHE
+
+
+ERROR_CORRECTION = {
+    'L': qrcode.constants.ERROR_CORRECT_L,
+    'M': qrcode.constants.ERROR_CORRECT_M,
+    'Q': qrcode.constants.ERROR_CORRECT_Q,
+    'H': qrcode.constants.ERROR_CORRECT_H,
+}
+
+IMAGE_FACTORIES = {
+    'svg': qrcode.image.svg.SvgPathImage,
+    'png': PilImage,
+}
+
+CONTENT_TYPES = {
+    'svg': 'image/svg+xml',
+    'png': 'image/png',
+}
+
+
+def qr_key(data: str, error_correction: str = 'L') -> str:
+    """content address of a qr code, the same data always gives the same image"""
+    return hashlib.sha256(f'{error_correction}:{data}'.encode()).hexdigest()
+
+
+def make_qr(data: str, kind: str = 'svg', error_correction: str = 'L') -> bytes:
+    qr = qrcode.QRCode(
+        error_correction=ERROR_CORRECTION[error_correction],
+        image_factory=IMAGE_FACTORIES[kind],
+    )
+    qr.add_data(data)
+    buf = BytesIO()
+    qr.make_image().save(buf)
+    return buf.getvalue()
+
+
+def get_qr(data: str, kind: str = 'svg', error_correction: str = 'L') -> tuple[str, bytes]:
+    """
+    Returns the key and image bytes for a qr code of `data`.
+    Looks in the fragments cache, then in default storage under
+    QR_CODE_DIR, and only generates the image when neither has it.
+    """
+    key = qr_key(data, error_correction)
+    cache_key = f'qr:{kind}:{key}'
+    cache = caches[FRAGMENT_CACHE]
+    image = cache.get(cache_key)
+    if image is not None:
+        return key, image
+
+    path = os.path.join(consts.QR_CODE_DIR, f'{key}.{kind}')
+    if default_storage.exists(path):
+        with default_storage.open(path, 'rb') as f:
+            image = f.read()
+    else:
+        image = make_qr(data, kind, error_correction)
+        default_storage.save(path, ContentFile(image))
+    cache.set(cache_key, image)
+    return key, image
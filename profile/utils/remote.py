@@ -0,0 +1,188 @@
+import io
+import os
+import time
+import socket
+import hashlib
+import ipaddress
+from contextlib import contextmanager
+from urllib.parse import urljoin, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+
+from . import consts, images
+
+# see settings.PROFILE_REMOTE_IMAGES
+DEFAULT_REMOTE_IMAGES = {
+    'WORKERS': 2,
+    'MAX_PENDING': 100,
+    'TIMEOUT': 5,
+    'MAX_BYTES': 5 * 1024 * 1024,
+    'MAX_REDIRECTS': 3,
+    'MAX_SIZE': 800,
+    'FORMAT': 'WEBP',
+    'BACKOFF': 60,
+    'MAX_BACKOFF': 60 * 60 * 24,
+    # failed fetches in a row retried on their own, later ones wait for a render
+    'MAX_RETRIES': 8,
+    'ALLOW_PRIVATE_HOSTS': False,
+}
+
+
+class RemoteImageError(Exception):
+    pass
+
+
+def remote_images_config() -> dict:
+    return {**DEFAULT_REMOTE_IMAGES, **getattr(settings, 'PROFILE_REMOTE_IMAGES', {})}
+
+
+def url_digest(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()[:32]
+
+
+def local_name(url: str) -> str:
+    """storage name of the local copy of a remote image"""
+    extension = images.output_extension(remote_images_config()['FORMAT'])
+    return os.path.join(consts.REMOTE_IMAGE_DIR, f'{url_digest(url)}{extension}')
+
+
+def failure_key(url: str) -> str:
+    return f'remote-image-failure:{url_digest(url)}'
+
+
+def backing_off(url: str) -> bool:
+    """whether `url` failed recently and shouldn't be fetched yet"""
+    failure = cache.get(failure_key(url))
+    return failure is not None and failure['retry_at'] > time.time()
+
+
+def record_failure(url: str, error) -> dict:
+    """
+    Remembers a failed fetch. The wait before the next try doubles with
+    every failure in a row, from BACKOFF up to MAX_BACKOFF seconds.
+    """
+    config = remote_images_config()
+    failures = (cache.get(failure_key(url)) or {}).get('failures', 0) + 1
+    wait = min(config['BACKOFF'] * 2 ** (failures - 1), config['MAX_BACKOFF'])
+    failure = {'failures': failures, 'retry_at': time.time() + wait, 'error': str(error)}
+    cache.set(failure_key(url), failure, timeout=config['MAX_BACKOFF'] * 2)
+    return failure
+
+
+def forget_failures(url: str):
+    cache.delete(failure_key(url))
+
+
+def resolve(hostname: str, port: int) -> list[str]:
+    """every address of `hostname`"""
+    try:
+        addresses = socket.getaddrinfo(hostname, port, proto=socket.IPPROTO_TCP)
+    except socket.gaierror as e:
+        raise RemoteImageError(f'cannot resolve {hostname}: {e}')
+    return [sockaddr[0] for *_, sockaddr in addresses]
+
+
+def checked_address(hostname: str, port: int, allow_private: bool = False) -> str:
+    """
+    The address to connect to for `hostname`. Raises RemoteImageError
+    unless every address of the host is public or `allow_private` is set.
+    """
+    addresses = resolve(hostname, port)
+    if not allow_private:
+        for address in addresses:
+            address = ipaddress.ip_address(address)
+            if not address.is_global or address.is_multicast:
+                raise RemoteImageError(f'{hostname} is not a public host')
+    if not addresses:
+        raise RemoteImageError(f'cannot resolve {hostname}')
+    return addresses[0]
+
+
+class PinnedAdapter(HTTPAdapter):
+    """
+    Connects to an already checked address while TLS still sends and
+    verifies the url's hostname, so the host isn't resolved a second time
+    between the check and the connection (DNS rebinding).
+    """
+    def __init__(self, hostname: str, **kwargs):
+        self.hostname = hostname
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs.update(server_hostname=self.hostname, assert_hostname=self.hostname)
+        super().init_poolmanager(*args, **kwargs)
+
+
+@contextmanager
+def open_url(url: str, config: dict):
+    """streamed response of a GET for `url`, sent to the checked address of its host"""
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise RemoteImageError(f'unsupported url {url}')
+    port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+    address = checked_address(parsed.hostname, port, config['ALLOW_PRIVATE_HOSTS'])
+
+    # ipv6 addresses are bracketed in urls and host headers
+    address = f'[{address}]' if ':' in address else address
+    hostname = f'[{parsed.hostname}]' if ':' in parsed.hostname else parsed.hostname
+    with requests.Session() as session:
+        if parsed.scheme == 'https':
+            session.mount('https://', PinnedAdapter(parsed.hostname))
+        with session.get(
+            parsed._replace(netloc=f'{address}:{port}').geturl(),
+            headers={'Host': f'{hostname}:{parsed.port}' if parsed.port else hostname},
+            stream=True,
+            timeout=config['TIMEOUT'],
+            allow_redirects=False,
+        ) as response:
+            yield response
+
+
+def download(url: str, config: dict) -> bytes:
+    """
+    The body of an image response for `url`, following a few redirects.
+    Stops at TIMEOUT seconds overall and MAX_BYTES, whichever comes first.
+    """
+    deadline = time.monotonic() + config['TIMEOUT']
+    for _ in range(config['MAX_REDIRECTS'] + 1):
+        try:
+            with open_url(url, config) as response:
+                if response.is_redirect:
+                    url = urljoin(url, response.headers['Location'])
+                    continue
+                response.raise_for_status()
+                if not response.headers.get('Content-Type', '').startswith('image/'):
+                    raise RemoteImageError(f'not an image: {response.headers.get("Content-Type")}')
+                if int(response.headers.get('Content-Length') or 0) > config['MAX_BYTES']:
+                    raise RemoteImageError('image too large')
+                body = bytearray()
+                # read1 returns what has arrived, so a trickling host still hits the deadline
+                while chunk := response.raw.read1(64 * 1024, decode_content=True):
+                    body += chunk
+                    if len(body) > config['MAX_BYTES']:
+                        raise RemoteImageError('image too large')
+                    if time.monotonic() > deadline:
+                        raise RemoteImageError('timed out')
+                return bytes(body)
+        except requests.RequestException as e:
+            raise RemoteImageError(str(e))
+    raise RemoteImageError('too many redirects')
+
+
+def fetch(url: str) -> bytes:
+    """
+    Downloads a remote image and returns it normalized to MAX_SIZE, see
+    images.normalize. Raises RemoteImageError when that isn't possible.
+    """
+    config = remote_images_config()
+    body = io.BytesIO(download(url, config))
+    try:
+        images.check_image(body)
+    except ValidationError as e:
+        raise RemoteImageError(e.messages[0])
+    content, extension = images.normalize(body, config['MAX_SIZE'], config['FORMAT'], keep_animated=False)
+    return content
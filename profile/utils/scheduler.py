@@ -0,0 +1,40 @@
+import logging
+import threading
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """
+    Calls `func` every `interval` seconds on a daemon thread until stopped.
+    Exceptions are logged and don't stop the schedule, and the thread's
+    database connections are closed after every run.
+    """
+    def __init__(self, func, interval: float, name: str | None = None):
+        self.func = func
+        self.interval = interval
+        self.name = name or func.__name__
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self):
+        try:
+            return self.func()
+        except Exception:
+            logger.exception('%s failed', self.name)
+        finally:
+            connections.close_all()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
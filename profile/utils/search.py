@@ -0,0 +1,85 @@
+import re
+
+from django.db import connections
+from django.db.models import Q, F, FloatField, Value
+from django.db.models.expressions import RawSQL
+
+from profile import models
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def fts5_query(query: str) -> str:
+    """user input as an FTS5 query of quoted prefix terms, so no input is a syntax error"""
+    return ' '.join(f'"{token}"*' for token in TOKEN_RE.findall(query))
+
+
+def tsquery(query: str) -> str:
+    """user input as a raw tsquery of prefix terms that must all match, like fts5_query"""
+    return ' & '.join(f'{token}:*' for token in TOKEN_RE.findall(query))
+
+
+def search_items(user, query: str):
+    """
+    `user`'s ItemCatalog entries matching `query`, annotated with `rank`
+    and ordered best match first.
+    Uses the search_vector column and its GIN index on PostgreSQL and the
+    profile_itemcatalog_fts table on SQLite (see migration 0011). Other
+    databases fall back to an unranked icontains filter.
+    """
+    qs = models.ItemCatalog.objects.filter(user=user)
+    if not TOKEN_RE.search(query):
+        return qs.none()
+
+    vendor = connections[qs.db].vendor
+    if vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+
+        search_query = SearchQuery(tsquery(query), config='english', search_type='raw')
+        qs = qs.annotate(
+            search_vector=RawSQL('"profile_itemcatalog"."search_vector"', [], output_field=SearchVectorField()),
+        ).filter(
+            search_vector=search_query,
+        ).annotate(
+            rank=SearchRank(F('search_vector'), search_query),
+        )
+    elif vendor == 'sqlite':
+        match = fts5_query(query)
+        qs = qs.filter(
+            pk__in=RawSQL(
+                'SELECT rowid FROM profile_itemcatalog_fts WHERE profile_itemcatalog_fts MATCH %s',
+                [match],
+            ),
+        ).annotate(
+            # bm25 is lower for better matches, columns weighted like setweight A, B, C
+            rank=RawSQL(
+                'SELECT -bm25(profile_itemcatalog_fts, 1.0, 0.4, 0.1) FROM profile_itemcatalog_fts '
+                'WHERE profile_itemcatalog_fts MATCH %s AND rowid = "profile_itemcatalog"."id"',
+                [match],
+                output_field=FloatField(),
+            ),
+        )
+    else:
+        terms = Q()
+        for token in TOKEN_RE.findall(query):
+            terms &= Q(search_a__icontains=token) | Q(search_b__icontains=token) | Q(search_c__icontains=token)
+        qs = qs.filter(terms).annotate(rank=Value(0.0, output_field=FloatField()))
+    return qs.order_by('-rank', '-updated')
+
+
+def search_profiles(user, query: str):
+    """`user`'s profiles containing every word of `query` in their name, title or headline"""
+    qs = models.Profile.objects.filter(user=user)
+    tokens = TOKEN_RE.findall(query)
+    if not tokens:
+        return qs.none()
+    for token in tokens:
+        qs = qs.filter(
+            Q(title__icontains=token)
+            | Q(first_name__icontains=token)
+            | Q(last_name__icontains=token)
+            | Q(nickname__icontains=token)
+            | Q(headline__icontains=token)
+            | Q(description__icontains=token)
+        )
+    return qs
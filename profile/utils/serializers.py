@@ -0,0 +1,168 @@
+import functools
+import hashlib
+import json
+
+from django.core.cache import caches
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+from .cache import FRAGMENT_CACHE
+
+# bumped on changes clients can't ignore, part of every payload and cache key
+API_VERSION = 1
+
+PROFILE_FIELDS = (
+    'fn',
+    'kind',
+    'prefix',
+    'first_name',
+    'middle_name',
+    'last_name',
+    'suffix',
+    'nickname',
+    'photo',
+    'headline',
+    'location',
+    'about',
+)
+
+# never part of an item's field set, nor are non-editable fields such as
+# timestamps or PostBase.description_html, which repeats the description
+EXCLUDED_ITEM_FIELDS = {'id', 'user'}
+
+# values derived from several fields, by item type
+COMPUTED_ITEM_FIELDS = {
+    # model_type's netloc joined with url unless the url is independent
+    'link': {'href': str},
+}
+
+
+class PayloadEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder that writes other values, like phone numbers, as their str()"""
+    def default(self, o):
+        try:
+            return super().default(o)
+        except TypeError:
+            return str(o)
+
+
+def item_type(item) -> str:
+    """type name of an item in payloads and fieldsets, proxies use their concrete model's"""
+    return item._meta.concrete_model._meta.model_name
+
+
+@functools.cache
+def item_fields(model) -> tuple[str, ...]:
+    """names of the fields serialized for an item model, in model order"""
+    model = model._meta.concrete_model
+    fields = tuple(
+        field.name for field in model._meta.concrete_fields
+        if field.editable and field.name not in EXCLUDED_ITEM_FIELDS
+    )
+    return fields + tuple(COMPUTED_ITEM_FIELDS.get(model._meta.model_name, {}))
+
+
+def parse_fieldsets(params) -> dict[str, frozenset]:
+    """
+    Sparse fieldsets from query parameters like fields[profile]=fn,photo
+    or fields[email]=email_address. Types without one get all their fields
+    and unknown field names are ignored.
+    """
+    fieldsets = {}
+    for key in params:
+        if key.startswith('fields[') and key.endswith(']'):
+            names = ','.join(params.getlist(key)).split(',')
+            fieldsets[key[7:-1]] = frozenset(name.strip() for name in names if name.strip())
+    return fieldsets
+
+
+def field_value(obj, name: str):
+    computed = COMPUTED_ITEM_FIELDS.get(item_type(obj), {}).get(name)
+    if computed is not None:
+        return computed(obj)
+    try:
+        field = obj._meta.get_field(name)
+    except FieldDoesNotExist:
+        # properties such as Profile.fn
+        return getattr(obj, name)
+    if field.many_to_one:
+        related = getattr(obj, name)
+        return str(related) if related is not None else None
+    value = getattr(obj, field.attname)
+    if isinstance(field, models.FileField):
+        return value.url if value else None
+    return value
+
+
+def serialize(obj, names, fieldset=None) -> dict:
+    """the `names` of `obj` that are in `fieldset`, empty values are left out"""
+    data = {}
+    for name in names:
+        if fieldset is not None and name not in fieldset:
+            continue
+        value = field_value(obj, name)
+        if value not in ('', None):
+            data[name] = value
+    return data
+
+
+def serialize_item(item, fieldsets: dict) -> dict:
+    type_ = item_type(item)
+    return {
+        'type': type_,
+        'id': item.pk,
+        **serialize(item, item_fields(type(item)), fieldsets.get(type_)),
+    }
+
+
+def profile_payload(profile, fieldsets: dict) -> dict:
+    """
+    The profile and its ordered contents, each content's item followed by
+    its attached items, as loaded by Profile.load_contents.
+    """
+    contents = []
+    for content in profile.load_contents():
+        item = content.item
+        if item is None:
+            continue
+        data = serialize_item(item, fieldsets)
+        attachments = [
+            serialize_item(subcontent.item, fieldsets)
+            for subcontent in content.subcontents.all()
+            if subcontent.item is not None
+        ]
+        if attachments:
+            data['attachments'] = attachments
+        contents.append(data)
+    return {
+        'api_version': API_VERSION,
+        'profile': {
+            'id': profile.pk,
+            'version': profile.version,
+            **serialize(profile, PROFILE_FIELDS, fieldsets.get('profile')),
+        },
+        'contents': contents,
+    }
+
+
+def payload_key(profile, fieldsets: dict) -> str:
+    """cache key of a payload, new whenever the profile's version changes"""
+    fields = repr(sorted((type_, sorted(names)) for type_, names in fieldsets.items()))
+    digest = hashlib.md5(fields.encode(), usedforsecurity=False).hexdigest()
+    return f'api:{API_VERSION}:profile:{profile.pk}:{profile.version}:{digest}'
+
+
+def encoded_payload(profile, fieldsets: dict) -> bytes:
+    """compact json of `profile_payload`, kept in the fragments cache"""
+    cache = caches[FRAGMENT_CACHE]
+    key = payload_key(profile, fieldsets)
+    body = cache.get(key)
+    if body is None:
+        body = json.dumps(
+            profile_payload(profile, fieldsets),
+            cls=PayloadEncoder,
+            separators=(',', ':'),
+        ).encode()
+        cache.set(key, body)
+    return body
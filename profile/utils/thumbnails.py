@@ -0,0 +1,36 @@
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings, defaults as thumbnail_defaults
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.parsers import parse_geometry
+
+
+class OriginalImage:
+    """
+    Stands in for a thumbnail that isn't generated yet with the original
+    image at the thumbnail's size, templates crop it with object-fit.
+    """
+    is_original = True
+
+    def __init__(self, file_, geometry: str):
+        self.url = file_.url
+        self.width, self.height = parse_geometry(geometry)
+
+
+def existing_thumbnail(file_, geometry: str, **options):
+    """
+    The thumbnail sorl's get_thumbnail returns for the same arguments
+    if it has been generated already, otherwise None. Never generates.
+    """
+    source = ImageFile(file_)
+    backend = default.backend
+    # the option defaults of ThumbnailBackend.get_thumbnail, so names match
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(thumbnail_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return default.kvstore.get(ImageFile(name, default.storage))
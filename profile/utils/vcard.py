@@ -1,7 +1,15 @@
+import re
+import quopri
 import vobject
 import datetime as dt
+from collections import defaultdict, namedtuple
 from django.apps import apps
-from djangoyearlessdate.helpers import YearlessDate
+from django.db import transaction
+from django.core.exceptions import ValidationError
+from django.contrib.contenttypes.models import ContentType
+
+from . import consts
+from ..fields import bulk_create_ordered
 
 # todo: parse groups, pref
 # todo: parse unrecognized content to BaseContentLine
@@ -77,21 +85,236 @@ def generate_gender(sex, gender) -> str:
     return f'{sex if sex!="" else ""}{";" + gender if gender!="" else ""}'
 
 
-def vcf_to_model_dicts(vcf: str) -> list[dict[str, list]]:
+# ---------------------------------------------------------------------
+# vCard 2.1/3.0/4.0 reading --------------------------------------------
+# ---------------------------------------------------------------------
+
+# [group.]name[;param[=value]...]:value, param values may be quoted
+CONTENT_LINE_RE = re.compile(
+    r'(?:(?P<group>[A-Za-z0-9-]+)\.)?(?P<name>[A-Za-z0-9-]+)'
+    r'(?P<params>(?:;(?:[^";:]|"[^"]*")*)*):(?P<value>.*)',
+    re.DOTALL,
+)
+PARAM_RE = re.compile(r';([^=;]*)(?:=((?:[^";]|"[^"]*")*))?')
+PARAM_VALUE_RE = re.compile(r'"([^"]*)"|([^,]+)')
+ESCAPE_RE = re.compile(r'\\(.)', re.DOTALL)
+ESCAPES = {'n': '\n', 'N': '\n'}
+
+VcardName = namedtuple('VcardName', 'family given additional prefix suffix', defaults=('',) * 5)
+VcardAddress = namedtuple('VcardAddress', 'box extended street city region code country', defaults=('',) * 7)
+# structured properties, ; separated parts with , separated components
+STRUCTURED_VALUES = {
+    'n': VcardName,
+    'adr': VcardAddress,
+}
+# ; separated parts
+SEMICOLON_LIST_VALUES = ('org',)
+# , separated parts
+COMMA_LIST_VALUES = ('categories', 'nickname')
+
+
+class VcardSyntaxError(ValueError):
+    pass
+
+
+class VcardProperty:
+    """a content line, shaped like vobject's ContentLine"""
+    __slots__ = ('name', 'group', 'params', 'singletonparams', 'value')
+
+    def __init__(self, name, group, params, singletonparams, value):
+        self.name = name
+        self.group = group
+        self.params = params
+        self.singletonparams = singletonparams
+        self.value = value
+
+    def __repr__(self):
+        return f'<{self.name}{self.params}: {self.value!r}>'
+
+
+class VcardRecord:
+    """a card, shaped like vobject's Component: properties by lower case name in `contents`"""
+    __slots__ = ('contents',)
+    name = 'VCARD'
+
+    def __init__(self, contents: dict):
+        self.contents = contents
+
+
+def iter_vcard_blocks(lines):
+    """
+    Lines of each BEGIN:VCARD ... END:VCARD block in `lines`, any iterable
+    of str or utf-8 bytes lines such as an open or uploaded file.
+    Only the current card is held in memory.
+    """
+    card = None
+    depth = 0
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        line = line.rstrip('\r\n').lstrip('\ufeff')
+        marker = line.strip().upper()
+        if marker == 'BEGIN:VCARD':
+            if card is None:
+                card = []
+            # vcard 2.1 AGENT properties nest cards
+            depth += 1
+        if card is not None:
+            card.append(line)
+            if marker == 'END:VCARD':
+                depth -= 1
+                if depth == 0:
+                    yield card
+                    card = None
+
+
+def unfold(raw_lines):
+    """
+    Logical lines of a card. Folded lines start with a space or tab and
+    quoted-printable values continue on the next line after a trailing =
+    """
+    line = None
+    quoted_printable = False
+    for raw in raw_lines:
+        if line is not None:
+            if quoted_printable and line.endswith('='):
+                line = line[:-1] + raw
+                continue
+            if raw[:1] in (' ', '\t'):
+                line += raw[1:]
+                continue
+            yield line
+        line = raw
+        quoted_printable = 'QUOTED-PRINTABLE' in raw.partition(':')[0].upper()
+    if line is not None:
+        yield line
+
+
+def split_unescaped(value: str, sep: str) -> list[str]:
+    """`value` split on `sep` where it isn't escaped with a backslash"""
+    if '\\' not in value:
+        return value.split(sep)
+    parts, current = [], []
+    chars = iter(value)
+    for char in chars:
+        if char == '\\':
+            current.append(char + next(chars, ''))
+        elif char == sep:
+            parts.append(''.join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append(''.join(current))
+    return parts
+
+
+def unescape(value: str) -> str:
+    if '\\' not in value:
+        return value
+    return ESCAPE_RE.sub(lambda m: ESCAPES.get(m[1], m[1]), value)
+
+
+def parse_params(params: str) -> tuple[dict, list]:
+    """
+    ({NAME: [values]}, [bare params]) for the ;params of a content line.
+    Bare params are vcard 2.1 types like TEL;CELL:
+    """
+    named, bare = {}, []
+    for key, value in PARAM_RE.findall(params):
+        if value:
+            named.setdefault(key.upper(), []).extend(
+                quoted or plain for quoted, plain in PARAM_VALUE_RE.findall(value)
+            )
+        elif key:
+            bare.append(key)
+    return named, bare
+
+
+def parse_value(name: str, value: str):
+    """a property value, structured and list values split like vobject does"""
+    if name in STRUCTURED_VALUES:
+        fields = STRUCTURED_VALUES[name]
+        parts = split_unescaped(value, ';')[:len(fields._fields)]
+        components = []
+        for part in parts:
+            part = [unescape(s) for s in split_unescaped(part, ',')]
+            components.append(part[0] if len(part) == 1 else part)
+        return fields(*components)
+    if name in SEMICOLON_LIST_VALUES:
+        return [unescape(s) for s in split_unescaped(value, ';')]
+    if name in COMMA_LIST_VALUES:
+        return [unescape(s) for s in split_unescaped(value, ',')]
+    return unescape(value)
+
+
+def tokenize_vcard(raw_lines: list[str]) -> VcardRecord:
+    """
+    Reads the lines of one card, see `iter_vcard_blocks`.
+    Raises VcardSyntaxError for input it doesn't handle, such as nested
+    cards, which `read_vcard` leaves to vobject.
+    """
+    lines = [line for line in unfold(raw_lines) if line.strip()]
+    if (
+        len(lines) < 2
+        or lines[0].strip().upper() != 'BEGIN:VCARD'
+        or lines[-1].strip().upper() != 'END:VCARD'
+    ):
+        raise VcardSyntaxError('not a single BEGIN:VCARD ... END:VCARD block')
+
+    contents = {}
+    for line in lines[1:-1]:
+        match = CONTENT_LINE_RE.fullmatch(line)
+        if match is None:
+            raise VcardSyntaxError(f'unreadable line {line[:40]!r}')
+        name = match['name'].lower()
+        if name in ('begin', 'end'):
+            raise VcardSyntaxError('nested components')
+        params, singletonparams = parse_params(match['params'])
+        value = match['value']
+
+        encoding = params.get('ENCODING')
+        if encoding:
+            if encoding[0].upper() != 'QUOTED-PRINTABLE':
+                # binary values like base64 photos are left as they are
+                contents.setdefault(name, []).append(
+                    VcardProperty(name, match['group'], params, singletonparams, value)
+                )
+                continue
+            del params['ENCODING']
+            charset = params.get('CHARSET', ['utf-8'])[0]
+            try:
+                value = quopri.decodestring(value.encode()).decode(charset, errors='replace')
+            except LookupError:
+                raise VcardSyntaxError(f'unknown charset {charset}')
+        if 'QUOTED-PRINTABLE' in (s.upper() for s in singletonparams):
+            # vcard 2.1 bare encoding param
+            singletonparams = [s for s in singletonparams if s.upper() != 'QUOTED-PRINTABLE']
+            value = quopri.decodestring(value.encode()).decode('utf-8', errors='replace')
+
+        contents.setdefault(name, []).append(
+            VcardProperty(name, match['group'], params, singletonparams, parse_value(name, value))
+        )
+    return VcardRecord(contents)
+
+
+def read_vcard(raw_lines: list[str]):
+    """`tokenize_vcard`, with vobject reading the cards it doesn't handle"""
     try:
-        v_iter = vobject.readComponents(vcf)
-    except Exception as e:
-        raise e
+        return tokenize_vcard(raw_lines)
+    except VcardSyntaxError:
+        return vobject.readOne('\r\n'.join(raw_lines) + '\r\n')
 
-    vcard_model_list = []
-    for v in v_iter:
-        v: vobject.base.Component
+
+def vcf_to_model_dicts(lines):
+    """
+    (card number, model dict) for every card in `lines`, see `iter_vcard_blocks`.
+    Cards that can't be read give the exception in place of the model dict.
+    """
+    for number, raw_lines in enumerate(iter_vcard_blocks(lines), start=1):
         try:
-            vcard_model_list.append(component_to_model_dict(v))
+            yield number, component_to_model_dict(read_vcard(raw_lines))
         except Exception as e:
-            raise e
-
-    return vcard_model_list
+            yield number, e
 
 
 def get_first_or_default(contents: dict, value: str, default=''):
@@ -105,20 +328,15 @@ def get_all_or_default(contents: dict, value: str, sep: str = '\n', default: str
     return r if r is not None else default
 
 
-def component_to_model_dict(v: vobject.base.Component) -> dict[str, list]:
+def component_to_model_dict(v: vobject.base.Component) -> dict:
+    """
+    Unsaved Profile and item models for a vcard
+    {'profile': Profile, 'items': [Email, Phone, Address, Link, Skill...]}
+    """
     assert v.name == 'VCARD'
     contents = v.contents
 
-    kind = get_first_or_default(contents, 'kind', INDIVIDUAL_KIND)
-    if kind.lower() in [i.lower() for i in KIND_CHOICES.values()]:
-        kind = kind.lower()[0]
-
-    if kind not in KIND_CHOICES.keys():
-        # coerce to individual
-        kind = INDIVIDUAL_KIND
-
-    # todo: parse fn for non individual kind
-    names = contents.get('n')
+    names = contents.get('n') or []
     if len(names) > 0:
         if len(names) == 1:
             n: vobject.vcard.Name = names[0].value
@@ -134,207 +352,255 @@ def component_to_model_dict(v: vobject.base.Component) -> dict[str, list]:
             if not found_pref:
                 # parse first name
                 n: vobject.vcard.Name = names[0].value
-        prefix = n.prefix
-        first_name = n.given
-        middle_name = n.additional
-        last_name = n.family
-        suffix = n.suffix
+        prefix = join_value(n.prefix)
+        first_name = join_value(n.given)
+        middle_name = join_value(n.additional)
+        last_name = join_value(n.family)
+        suffix = join_value(n.suffix)
     else:
         # todo: parse fn better
         prefix = ''
         first_name = ''
         middle_name = ''
-        last_name = contents.get('fn')[0].value
+        last_name = get_first_or_default(contents, 'fn')
         suffix = ''
 
+    fn = get_first_or_default(contents, 'fn')
     nickname = get_first_or_default(contents, 'nickname')
-    # photo =  # todo: photo...
-
-    byear, bmonth, bday = parse_vcard_date(contents.get('bday'))
-    birthday = None
-    birthday_year = None
-    if bday is not None and bmonth is not None:
-        birthday = YearlessDate(day=bday, month=bmonth)
-    if byear is not None:
-        birthday_year = byear
-
-    ayear, amonth, aday = parse_vcard_date(contents.get('anniversary'))
-    anniversary = None
-    anniversary_year = None
-    if aday is not None and amonth is not None:
-        anniversary = YearlessDate(day=aday, month=amonth)
-    if ayear is not None:
-        anniversary_year = ayear
-
-
-    # gender = ...  # todo: gender
-
+    if isinstance(nickname, list):
+        nickname = nickname[0]
     note = get_all_or_default(contents, 'note')
 
-    adr_models = parse_vcard_adr(contents.get('adr'))
-    phone_models = parse_vcard_tel(contents.get('tel'))
-    email_models = parse_vcard_email(contents.get('email'))
-    title_models = parse_vcard_title(contents.get('title'))
-    role_models = parse_vcard_role(contents.get('role'))
-    org_models = parse_vcard_org(contents.get('org'))
-    tag_models = parse_vcard_tag(contents.get('categories'))
-    url_models = parse_vcard_url(contents.get('url'))
-    url_models += parse_vcard_url(contents.get('x-socialprofile'))
-
-    card_model = apps.get_model('account.Card')
-    card = card_model(
-        kind=kind,
+    titles = [join_value(c.value) for c in contents.get('title', [])]
+    orgs = [join_value(c.value) for c in contents.get('org', [])]
+    headline = ', '.join(s for s in titles[:1] + orgs[:1] if s)
+
+    profile_model = apps.get_model('profile.Profile')
+    profile = profile_model(
+        kind=profile_model.Kind.INDIVIDUAL,
+        title=fn or ' '.join(s for s in (first_name, last_name) if s),
         prefix=prefix,
         first_name=first_name,
         middle_name=middle_name,
         last_name=last_name,
         suffix=suffix,
         nickname=nickname,
-        # photo=photo,
-        birthday=birthday,
-        birthday_year=birthday_year,
-        anniversary=anniversary,
-        anniversary_year=anniversary_year,
-        sex='',  # sex,
-        gender='',  # gender,
-        note=note
+        headline=headline,
+        about=note,
+    )
+
+    items = (
+        parse_vcard_email(contents.get('email'))
+        + parse_vcard_tel(contents.get('tel'))
+        + parse_vcard_adr(contents.get('adr'))
+        + parse_vcard_url(contents.get('url'))
+        + parse_vcard_url(contents.get('x-socialprofile'))
+        + parse_vcard_tag(contents.get('categories'))
     )
 
     return {
-        'card': card,
-        'adr_models': adr_models,
-        'phone_models': phone_models,
-        'email_models': email_models,
-        'title_models': title_models,
-        'role_models': role_models,
-        'org_models': org_models,
-        'tag_models': tag_models,
-        'url_models': url_models
+        'profile': profile,
+        'items': items,
     }
 
 
-def save_model_dict_to_db(user, model_dicts: list[dict]):
-    for mod_dict in model_dicts:
+def join_value(value) -> str:
+    """vobject gives list values for properties with , separated parts"""
+    if isinstance(value, (list, tuple)):
+        return ' '.join(str(v) for v in value if v)
+    return str(value or '')
+
+
+def validate_model_dict(model_dict: dict) -> list[str]:
+    """
+    Validates the profile and items of a model dict in place. Invalid items
+    are dropped and an invalid profile raises ValidationError.
+    Returns messages for the dropped items.
+    """
+    # related objects are set on save
+    exclude = ['user', 'model_type']
+    model_dict['profile'].full_clean(exclude=exclude)
+    valid, dropped = [], []
+    for item in model_dict['items']:
         try:
-            new_card = mod_dict['card']
-            new_card.user = user
-            new_card.save()
-
-            for mod_name, mod_list in mod_dict.items():
-                if mod_name.endswith('_models'):
-                    for mod in mod_list:
-                        mod.card = new_card
-                        mod.save()
-        except Exception as e:
-            raise e
+            item.full_clean(exclude=exclude)
+        except ValidationError as e:
+            dropped.append(f'{item._meta.verbose_name} skipped: {"; ".join(e.messages)}')
+        else:
+            valid.append(item)
+    model_dict['items'] = valid
+    return dropped
+
+
+def save_model_dicts_to_db(user, model_dicts: list[dict]) -> list:
+    """
+    Saves the profiles and items of validated model dicts for `user` with
+    one INSERT per model in a single transaction, see `VcardImport`.
+    Returns the new profiles.
+    """
+    profile_model = apps.get_model('profile.Profile')
+    link_model = apps.get_model('profile.ProfileLink')
+    content_model = apps.get_model('profile.Content')
+    catalog_model = apps.get_model('profile.ItemCatalog')
+
+    items_by_model = defaultdict(list)
+    for mod_dict in model_dicts:
+        mod_dict['profile'].user = user
+        for item in mod_dict['items']:
+            item.user = user
+            items_by_model[type(item)].append(item)
+
+    with transaction.atomic():
+        profiles = profile_model.objects.bulk_create([mod_dict['profile'] for mod_dict in model_dicts])
+        # the default link Profile.save would create
+        link_model.objects.bulk_create([
+            link_model(label='Default', profile=profile, is_expired=False)
+            for profile in profiles
+        ])
+        for model, items in items_by_model.items():
+            model.objects.bulk_create(items)
+
+        contents = [
+            content_model(profile=mod_dict['profile'], item=item)
+            for mod_dict in model_dicts
+            for item in mod_dict['items']
+        ]
+        bulk_create_ordered(content_model, contents)
+        # bulk_create sends no post_save, so catalog the items here
+        catalog_model.objects.bulk_create([
+            catalog_model.entry_for(content.item, usage_count=1)
+            for content in contents
+        ])
+    return profiles
+
+
+class VcardImport:
+    """
+    Imports a vcf file as profiles of `user`, one profile per card.
+    Cards are parsed as the file is read and every `chunk_size` valid
+    cards are written with `save_model_dicts_to_db`. Cards that fail to
+    parse or validate are left out and collected in `errors` as
+    (card number, message), as are items dropped from imported cards.
+    """
+    def __init__(self, user, chunk_size: int = consts.VCARD_IMPORT_CHUNK_SIZE):
+        self.user = user
+        self.chunk_size = chunk_size
+        self.read = 0
+        self.imported = 0
+        self.errors = []
+
+    def run(self, lines, progress=None):
+        """
+        imports every card in `lines`, calling `progress(self)` after
+        each chunk is saved
+        """
+        chunk = []
+        for number, mod_dict in vcf_to_model_dicts(lines):
+            self.read = number
+            if isinstance(mod_dict, Exception):
+                self.errors.append((number, f'unreadable card: {mod_dict}'))
+                continue
+            try:
+                dropped = validate_model_dict(mod_dict)
+            except ValidationError as e:
+                self.errors.append((number, '; '.join(e.messages)))
+                continue
+            self.errors.extend((number, message) for message in dropped)
+            chunk.append(mod_dict)
+            if len(chunk) >= self.chunk_size:
+                self.save(chunk, progress)
+                chunk = []
+        self.save(chunk, progress)
+        return self
+
+    def save(self, chunk: list[dict], progress=None):
+        if chunk:
+            save_model_dicts_to_db(self.user, chunk)
+            self.imported += len(chunk)
+        if progress is not None:
+            progress(self)
+
+
+# date forms seen in vcards, tried in order
+DATE_RES = (
+    # YYYYMMDD, YYYY-MM-DD, YYYY/MM/DD with an optional time
+    re.compile(r'(?P<year>\d{4})([-/]?)(?P<month>\d{2})\2(?P<day>\d{2})(?:T.*)?'),
+    # --MMDD, --MM-DD
+    re.compile(r'--(?P<month>\d{2})-?(?P<day>\d{2})'),
+    # YYMMDD
+    re.compile(r'(?P<yy>\d{2})(?P<month>\d{2})(?P<day>\d{2})'),
+    # YYYY-MM
+    re.compile(r'(?P<year>\d{4})[-/](?P<month>\d{2})'),
+    # MM-YYYY
+    re.compile(r'(?P<month>\d{2})[-/](?P<year>\d{4})'),
+    # YYYY
+    re.compile(r'(?P<year>\d{4})'),
+)
 
 
 def parse_vcard_date(content_list: list | None) -> tuple[int | None, int | None, int | None]:
-    # todo: regex this shit
-    year = None
-    month = None
-    day = None
-    if content_list is not None:
-        try:
-            d_content = content_list[0]  # parsing 1st only
-            d = d_content.value
-
-            ommit_year = 'X_APPLE_OMIT_YEAR' in d_content.params
-
-            delim_str = ''
-            if '-' in d:
-                delim_str = '-'
-            elif '/' in d:
-                delim_str = '/'
-            delimited = delim_str != ''
-            delim_count = 0
-            if delimited: delim_count = d.count(delim_str)
-
-            if delimited:
-                is_numeric = ''.join(d.split(delim_str)).isnumeric()
-            else:
-                is_numeric = d.isnumeric()
-
-            if is_numeric:
-                if delim_count == 0:
-                    if len(d) in [6, 8]:
-                        # YYYYMMDD or YYMMDD
-                        # assume 1st 2 or 4 digits are year
-                        if len(d) == 6:
-                            year = int(d[:2])
-                            if year <= dt.datetime.today().year % 100:  # 2000s
-                                year += (dt.datetime.today().year // 100) * 100
-                            else:
-                                year += (dt.datetime.today().year // 100 - 1) * 100
-                        month = int(d[4:6])
-                        day = int(d[6:])
-                    elif len(d) == 4:
-                        # YYYY
-                        year = int(d)
-                elif delim_count == 1:
-                    if d.find(delim_str) == 4:
-                        # YYYY-MM format
-                        year = int(d[:4])
-                        month = int(d[4:6])
-                    elif d.find(delim_str) == 2:
-                        # MM-YYYY
-                        year = int(d[2:6])
-                        month = int(d[:2])
-                elif delim_count == 2:
-                    if len(d) == 10 and d.find(delim_str) == 4 and d.find(delim_str, 5) == 7:
-                        # YYYY-MM-DD
-                        ymd = d.split(delim_str)
-                        year = int(ymd[0])
-                        month = int(ymd[1])
-                        day = int(ymd[2])
-                    elif len(d) == 6 and d.find('-') == 0 and d.find('-', 1) == 1:
-                        # --MMDD
-                        month = int(d[2:4])
-                        day = int(d[4:6])
-        except:
-            pass
-
-        if ommit_year: year = None
+    """(year, month, day) of the first date in `content_list`, parts not given are None"""
+    if not content_list:
+        return None, None, None
+    d_content = content_list[0]  # parsing 1st only
+    d = str(d_content.value).strip()
+
+    for date_re in DATE_RES:
+        match = date_re.fullmatch(d)
+        if match is not None:
+            break
+    else:
+        return None, None, None
+
+    parts = match.groupdict()
+    year = int(parts['year']) if parts.get('year') else None
+    if parts.get('yy'):
+        # assume the most recent century that isn't in the future
+        year = int(parts['yy']) + (dt.date.today().year // 100) * 100
+        if year > dt.date.today().year:
+            year -= 100
+    month = int(parts['month']) if parts.get('month') else None
+    day = int(parts['day']) if parts.get('day') else None
+
+    if (month is not None and not 1 <= month <= 12) or (day is not None and not 1 <= day <= 31):
+        return None, None, None
+    if 'X-APPLE-OMIT-YEAR' in d_content.params or str(year) == X_APPLE_OMIT_YEAR:
+        year = None
     return year, month, day
 
 
 def parse_type(content: vobject.base.ContentLine, type_choices: dict) -> str:
-    found_type = ''
-    if 'TYPE' in [s for s in content.params.keys()]:
-        # todo: parse when TYPE not upper
-        found_usable_type = False
-        usable_types = [s.lower() for s in type_choices.values()]
-        # todo: should parse all recognized types
-        for t in content.params['TYPE']:
-            if t.lower() in usable_types and not found_usable_type:
-                found_usable_type = True
-                return t.lower()[0]  # first letter corresponds to db value
-    return found_type
+    # TYPE values and vcard 2.1 bare types like TEL;WORK:
+    types = content.params.get('TYPE', []) + list(content.singletonparams)
+    usable_types = [s.lower() for s in type_choices.values()]
+    # todo: should parse all recognized types
+    for t in types:
+        if t.lower() in usable_types:
+            return t.lower()[0]  # first letter corresponds to db value
+    return ''
+
+
+def parse_info_type(content: vobject.base.ContentLine) -> str:
+    """ContactInfoBase.InfoTypes value of a property's TYPE param"""
+    return parse_type(content, WH_TYPE_CHOICES).upper()
 
 
 def parse_vcard_adr(content_list: list | None) -> list:
     adr_list = []
     if content_list is not None:
-        address_model = apps.get_model('account.Address')
+        address_model = apps.get_model('profile.Address')
         for content in content_list:
             content: vobject.base.ContentLine
-            # type params
-            adr_type = parse_type(content, WH_TYPE_CHOICES)
             adr: vobject.vcard.Address = content.value
             # ignore street2 possibility and only use street1
-            street1 = adr.street
-            city = adr.city
-            state = adr.region
-            zip = adr.code
-            country = adr.country
             adr_list.append(
-                address_model(address_type=adr_type,
-                              street1=street1,
+                address_model(info_type=parse_info_type(content),
+                              street1=join_value(adr.street),
                               street2='',
-                              city=city,
-                              state=state,
-                              zip=zip,
-                              country=country)
+                              city=join_value(adr.city),
+                              state=join_value(adr.region),
+                              zip=join_value(adr.code),
+                              country=join_value(adr.country))
             )
     return adr_list
 
@@ -342,15 +608,16 @@ def parse_vcard_adr(content_list: list | None) -> list:
 def parse_vcard_tel(content_list: list | None) -> list:
     tel_list = []
     if content_list is not None:
-        phone_model = apps.get_model('account.Phone')
+        phone_model = apps.get_model('profile.Phone')
         for content in content_list:
             content: vobject.base.ContentLine
-            # type params
-            phone_type = parse_type(content, PHONE_TYPE_CHOICES)
-            phone_number = content.value  # todo: gotta format / validate this
+            phone_number = content.value.strip()
+            if phone_number.lower().startswith('tel:'):
+                # vcard 4 uri value
+                phone_number = phone_number[4:]
             tel_list.append(
                 phone_model(phone_number=phone_number,
-                            phone_type=phone_type)
+                            info_type=parse_info_type(content))
             )
     return tel_list
 
@@ -358,66 +625,19 @@ def parse_vcard_tel(content_list: list | None) -> list:
 def parse_vcard_email(content_list: list | None) -> list:
     email_list = []
     if content_list is not None:
-        email_model = apps.get_model('account.Email')
+        email_model = apps.get_model('profile.Email')
         for content in content_list:
             content: vobject.base.ContentLine
-            # type params
-            email_type = parse_type(content, WH_TYPE_CHOICES)
-            email_address = content.value
             email_list.append(
-                email_model(email_type=email_type,
-                            email_address=email_address)
+                email_model(email_address=content.value.strip(),
+                            info_type=parse_info_type(content))
             )
     return email_list
 
 
-def parse_vcard_title(content_list: list | None) -> list:
-    prop_list = []
-    if content_list is not None:
-        mod = apps.get_model(f'account.Title')
-        for content in content_list:
-            content: vobject.base.ContentLine
-            # type params - not saved in db
-            prop_val = content.value
-            if isinstance(prop_val, list):  # eg org with ; delimiter
-                prop_val = ', '.join(prop_val)
-            prop_list.append(mod(title=prop_val))
-    return prop_list
-
-
-def parse_vcard_role(content_list: list | None) -> list:
-    prop_list = []
-    if content_list is not None:
-        mod = apps.get_model(f'account.Role')
-        for content in content_list:
-            content: vobject.base.ContentLine
-            # type params - not saved in db
-            prop_val = content.value
-            if isinstance(prop_val, list):  # eg org with ; delimiter
-                prop_val = ', '.join(prop_val)
-            prop_list.append(mod(role=prop_val))
-    return prop_list
-
-
-def parse_vcard_org(content_list: list | None) -> list:
-    prop_list = []
-    if content_list is not None:
-        mod = apps.get_model(f'account.Org')
-        for content in content_list:
-            content: vobject.base.ContentLine
-            # type params - not saved in db
-            prop_val = content.value
-            if isinstance(prop_val, list):  # eg org with ; delimiter
-                prop_val = ', '.join(prop_val)
-            prop_list.append(mod(organization=prop_val))
-    return prop_list
-
-
 def parse_vcard_tag(content_list: list | None) -> list:
     tag_str_list = []
-    tag_model_list = []
     if content_list is not None:
-        tag_model = apps.get_model('account.Tag')
         for content in content_list:
             content: vobject.base.ContentLine
             tag_value = content.value
@@ -426,21 +646,17 @@ def parse_vcard_tag(content_list: list | None) -> list:
                     tag_str_list.append(t)
             else:
                 tag_str_list.append(tag_value)
-        for t in tag_str_list:
-            tag_model_list.append(
-                tag_model(tag=t)
-            )
-    return tag_model_list
+    skill_model = apps.get_model('profile.Skill')
+    # dict keeps the first of any repeated tags
+    return [skill_model(label=t) for t in dict.fromkeys(t.strip() for t in tag_str_list) if t]
 
 
 def parse_vcard_url(content_list: list | None) -> list:
     url_list = []
     if content_list is not None:
-        url_model = apps.get_model('account.Url')
+        url_model = apps.get_model('profile.Link')
         for content in content_list:
             content: vobject.base.ContentLine
-            #  recognized type param
-            url_type = parse_type(content, WH_TYPE_CHOICES)
 
             # use first unrecognized type param as optional label
             label = ''
@@ -453,8 +669,117 @@ def parse_vcard_url(content_list: list | None) -> list:
                         found_unusable_type = True
                         label = t
 
-            url = content.value
+            # saved as Website links
             url_list.append(
-                url_model(url_type=url_type, url=url, label=label)
+                url_model(url=content.value.strip(), label=label, model_type_id=1, is_independent_url=True)
             )
     return url_list
+
+
+# ---------------------------------------------------------------------
+# vCard 4.0 (RFC 6350) output ------------------------------------------
+# ---------------------------------------------------------------------
+
+# item models written to vcards
+VCARD_ITEM_MODELS = ('email', 'phone', 'address', 'link')
+
+INFO_TYPE_PARAMS = {
+    'W': ';TYPE=work',
+    'H': ';TYPE=home',
+}
+
+
+def escape_value(value) -> str:
+    return (str(value)
+            .replace('\\', '\\\\')
+            .replace('\n', '\\n')
+            .replace(',', '\\,')
+            .replace(';', '\\;'))
+
+
+def fold_line(line: str) -> str:
+    """splits a content line into 75 octet lines joined with CRLF and a space"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # don't split a multi byte character
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+        limit = 74  # continuation lines start with a space
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def item_lines(item) -> list[str]:
+    model_name = item._meta.concrete_model._meta.model_name
+    params = INFO_TYPE_PARAMS.get(getattr(item, 'info_type', ''), '')
+    if model_name == 'email':
+        return [f'EMAIL{params}:{escape_value(item.email_address)}']
+    if model_name == 'phone':
+        number = item.phone_number
+        number = number.as_e164 if hasattr(number, 'as_e164') else str(number)
+        return [f'TEL;VALUE=uri{params}:tel:{number}']
+    if model_name == 'address':
+        street = ', '.join(s for s in (item.street1, item.street2) if s)
+        components = ('', '', street, item.city, item.state, item.zip, item.country)
+        return [f'ADR{params}:' + ';'.join(escape_value(c) for c in components)]
+    if model_name == 'link':
+        # str() joins the LinkBase netloc to urls that aren't independent
+        return [f'URL:{item}']
+    return []
+
+
+def profile_to_vcard(profile, items) -> str:
+    """vCard 4.0 text of a profile and its Email, Phone, Address and Link items"""
+    lines = [
+        'BEGIN:VCARD',
+        'VERSION:4.0',
+        'KIND:individual',
+        f'FN:{escape_value(profile.fn.strip())}',
+        'N:' + ';'.join(escape_value(n) for n in (
+            profile.last_name,
+            profile.first_name,
+            profile.middle_name,
+            profile.prefix,
+            profile.suffix,
+        )),
+    ]
+    if profile.nickname:
+        lines.append(f'NICKNAME:{escape_value(profile.nickname)}')
+    if profile.headline:
+        lines.append(f'TITLE:{escape_value(profile.headline)}')
+    if profile.about:
+        lines.append(f'NOTE:{escape_value(profile.about)}')
+    for item in items:
+        lines += item_lines(item)
+    lines.append(f'REV:{profile.updated.astimezone(dt.timezone.utc).strftime("%Y%m%dT%H%M%SZ")}')
+    lines.append('END:VCARD')
+    return ''.join(fold_line(line) for line in lines)
+
+
+def vcard_item_querysets() -> list:
+    """querysets of the VCARD_ITEM_MODELS for a GenericPrefetch of Content.item, links with their LinkBase"""
+    querysets = []
+    for model_name in VCARD_ITEM_MODELS:
+        model = apps.get_model(app_label='profile', model_name=model_name)
+        qs = model._base_manager.all()
+        if model_name == 'link':
+            qs = qs.select_related('model_type')
+        querysets.append(qs)
+    return querysets
+
+
+def vcard_items(profile) -> list:
+    """the vcard items among a profile's contents, in order, for contents loaded with `vcard_contents`"""
+    contents = getattr(profile, 'vcard_contents', None)
+    if contents is None:
+        contents = [
+            c for c in profile.content_list
+            if ContentType.objects.get_for_id(c.content_type_id).model in VCARD_ITEM_MODELS
+        ]
+    return [c.item for c in contents if c.item is not None]
@@ -0,0 +1,44 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerPool:
+    """
+    Runs functions on a small pool of daemon threads, started on first use.
+    Like PeriodicTask, exceptions are logged and each thread's database
+    connections are closed after every call.
+    """
+    def __init__(self, max_workers: int, name: str):
+        self.max_workers = max_workers
+        self.name = name
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix=self.name)
+            return self._executor
+
+    def submit(self, func, *args, **kwargs):
+        return self.executor.submit(self._run, func, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _run(self, func, *args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            logger.exception('%s: %s failed', self.name, getattr(func, '__name__', func))
+        finally:
+            connections.close_all()
@@ -1,30 +1,35 @@
-import qrcode
+import hashlib
 import inspect
 import datetime as dt
-import qrcode.image.svg
-from profile.utils import vcard, consts
+from collections import defaultdict
+from profile.utils import vcard, consts, qr
 from braces.views import CsrfExemptMixin, JsonRequestResponseMixin
 
 from django import forms as dforms
 from django.apps import apps
 from django.urls import reverse_lazy
-from django.db.models import Value, F, When, Q
+from django.db import transaction
+from django.db.models import Value, F, When, Q, Case, Prefetch
 from django.core.files.base import ContentFile
 from django.forms.models import modelform_factory
 from formtools.wizard.views import SessionWizardView
-from django.http import HttpResponseNotAllowed
+from django.http import HttpResponse, HttpResponseNotAllowed, Http404, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils.decorators import method_decorator
 from django.shortcuts import render, get_object_or_404, redirect
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 
 from django.contrib import messages
 from django.utils.timezone import now
+from django.utils.text import slugify
 from django.contrib.sites.models import Site
 from django.contrib.auth import get_user_model
 from django.contrib.auth import views as auth_views
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.contenttypes.prefetch import GenericPrefetch
 
 from django.views import generic
 from django.views.defaults import page_not_found
@@ -36,7 +41,11 @@ from django.views.generic.edit import ModelFormMixin
 
 from profile import forms
 from profile import models
-from profile.utils import helpers
+from profile import signals
+from profile import tasks
+from profile.fields import bulk_create_ordered
+from profile.utils import helpers, library, search, graph, serializers
+from profile.utils.pagination import KeysetPage
 
 
 def home(request):
@@ -119,6 +128,36 @@ def profile_list(request):
     )
 
 
+@login_required
+def profile_import(request):
+    """
+    Imports an uploaded vcf file, one new profile per card.
+    The upload is read line by line so large files aren't loaded at once.
+    """
+    run = None
+    if request.method == 'POST':
+        form = forms.ImportVcardForm(data=request.POST, files=request.FILES)
+        if form.is_valid():
+            run = vcard.VcardImport(request.user).run(form.cleaned_data['file'])
+            messages.success(
+                request=request,
+                message=f'Imported {run.imported} of {run.read} contacts',
+            )
+            if not run.errors:
+                return redirect('profile_list')
+    else:
+        form = forms.ImportVcardForm()
+    return render(
+        request,
+        'profile/manage/import_vcards.html',
+        {
+            'section': 'profiles',
+            'form': form,
+            'run': run,
+        }
+    )
+
+
 class ProfileCreateUpdateView(
     LoginRequiredMixin,
     UserMixin,
@@ -194,6 +233,42 @@ def profile_delete(request, profile_pk):
     return redirect('profile_list')
 
 
+def page_etag(request, *parts) -> str | None:
+    """
+    Strong etag of a page from `parts`, which must cover everything the page
+    shows besides what base.html adds for the viewer. None while flash
+    messages are pending, those are only shown once so the page can't be reused.
+    """
+    if len(messages.get_messages(request)):
+        return None
+    user = request.user
+    # base.html shows the viewer's name and outstanding request count and
+    # the page's csrf tokens are only valid for the current csrf secret,
+    # which rotates on login and is missing when the cookie was cleared
+    viewer = (
+        user.pk,
+        models.ConnectionRequest.outstanding_count(user.pk) if user.is_authenticated else None,
+        request.META.get('CSRF_COOKIE'),
+    )
+    key = repr((viewer, parts)).encode()
+    return f'"{hashlib.md5(key, usedforsecurity=False).hexdigest()}"'
+
+
+def conditional_page(request, etag, render_page) -> HttpResponse:
+    """
+    304 Not Modified when the request's If-None-Match matches `etag`, else
+    `render_page()`. Browsers revalidate on every visit and shared caches
+    never store these pages.
+    """
+    response = get_conditional_response(request, etag=etag) if etag else None
+    if response is None:
+        response = render_page()
+    if etag:
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 @login_required
 def profile(request, profile_pk):
     p = get_object_or_404(
@@ -201,7 +276,12 @@ def profile(request, profile_pk):
         user=request.user,
         pk=profile_pk,
     )
-    return render(
+    # profile.version covers the profile and its contents, links don't bump it
+    etag = page_etag(
+        request, 'profile', p.pk, p.version,
+        list(p.links.filter(is_expired=False).values_list('pk', 'label')),
+    )
+    return conditional_page(request, etag, lambda: render(
         request,
         'profile/detail.html',
         {
@@ -209,7 +289,7 @@ def profile(request, profile_pk):
             'entity': 'self',
             'profile': p,
         }
-    )
+    ))
 
 
 class ProfileDetailEditView(
@@ -278,6 +358,7 @@ def update_profile_img(request, profile_pk):
         )
         if form.is_valid():
             form.save()
+            tasks.enqueue_photo(user_profile)
             return redirect('profile', profile_pk)
     else:
         form = forms.ProfileImgEditForm(instance=user_profile)
@@ -305,25 +386,58 @@ def profile_img_delete(request, profile_pk):
 
 @login_required
 def user_content_view(request):
-    c = dict()
-    for category, mods in consts.CONTENT_CATEGORIES.items():
-        mod_dict = dict()
-        c[category] = None
-        for mod_name in mods:
-            mn = ''.join(d.lower() for d in mod_name.split(' '))
-            mod = apps.get_model(app_label='profile', model_name=mn)
-            objs = mod.objects.filter(user=request.user)
-            if objs.exists():
-                mod_dict[mod_name] = objs
-        if mod_dict:
-            c[category] = mod_dict
+    category = request.GET.get('category')
+    if category not in consts.CONTENT_CATEGORIES:
+        category = None
+    lib = library.ItemLibrary(
+        request.user,
+        library.category_kinds([category] if category else None),
+    )
+    page = lib.page(request.GET.get('page'))
 
     return render(
         request,
         'user_content.html',
         {
             'section': 'content',
-            'content_dict': c,
+            'content_dict': lib.grouped(page.object_list),
+            'page': page,
+            'category': category,
+            'content_categories': consts.CONTENT_CATEGORIES,
+        }
+    )
+
+
+@login_required
+def search_view(request):
+    q = request.GET.get('q', '').strip()
+    page = Paginator(search.search_items(request.user, q), 20).get_page(request.GET.get('page'))
+
+    # load the page's items with one query per content type
+    object_ids = defaultdict(list)
+    for entry in page.object_list:
+        object_ids[entry.content_type_id].append(entry.object_id)
+    items = {}
+    for content_type_id, ids in object_ids.items():
+        ct = ContentType.objects.get_for_id(content_type_id)
+        for pk, obj in ct.model_class()._base_manager.in_bulk(ids).items():
+            items[content_type_id, pk] = (obj, ct.model)
+    # (catalog entry, item, model name for the item urls)
+    results = [
+        (entry, *items[entry.content_type_id, entry.object_id])
+        for entry in page.object_list
+        if (entry.content_type_id, entry.object_id) in items
+    ]
+
+    return render(
+        request,
+        'partials/search_results.html' if request.headers.get('HX-Request') else 'search.html',
+        {
+            'section': 'content',
+            'q': q,
+            'page': page,
+            'results': results,
+            'profiles': search.search_profiles(request.user, q) if page.number == 1 else [],
         }
     )
 
@@ -475,6 +589,8 @@ class ContentCreateUpdateView(
             item = form.save(commit=False)
             item.user = request.user
             item.save()
+            if isinstance(item, models.Attachment) and 'file' in form.changed_data:
+                tasks.enqueue_attachment(item)
             if profile_pk:
                 if content_pk:
                     return redirect('profile', self.profile.pk)
@@ -562,26 +678,23 @@ class ProfileSelectContentView(
         """gets all items associated with user or content for all item models"""
         self.qs_dict = {}
         self.initial_dict = {}
-        for content_type in consts.CONTENT_TYPES:
-            mod = apps.get_model(app_label='profile', model_name=content_type)
-            user_objs = mod.objects.filter(user=self.user)
-            # below raises django.core.exceptions.FieldError:
-            # Unsupported lookup 'contains' for GenericRel or join on the field not permitted.
-            # todo: for now can still attach content to itself
-            # if self.content:
-            #     # if we're linking items to a content, don't include the item
-            #     # associated with the from content
-            #     user_objs.exclude(content_related__contains=self.content)
-            if user_objs.exists():
-                self.qs_dict[content_type] = user_objs
-                if self.content:
-                    self.initial_dict[content_type] = user_objs.filter(
-                        subcontent_related__content=self.content,
-                    )
-                else:
-                    self.initial_dict[content_type] = user_objs.filter(
-                        content_related__profile=self.profile,
-                    )
+        # todo: for now can still attach content to itself
+        # one query finds which item models the user has anything in
+        lib = library.ItemLibrary(self.user, library.content_type_kinds())
+        has_items = lib.counts()
+        if self.content:
+            rows = models.ContentContent.objects.filter(content=self.content)
+        else:
+            rows = models.Content.objects.filter(profile=self.profile)
+        selected = defaultdict(list)
+        for content_type_id, object_id in rows.values_list('content_type_id', 'object_id'):
+            selected[content_type_id].append(object_id)
+
+        for category, content_type, mod in lib.kinds:
+            if content_type in has_items:
+                self.qs_dict[content_type] = mod.objects.filter(user=self.user)
+                ct = ContentType.objects.get_for_model(mod)
+                self.initial_dict[content_type] = selected[ct.pk]
 
     def dispatch(self, request, profile_pk, content_pk=None, *args, **kwargs):
         self.user = request.user
@@ -611,49 +724,51 @@ class ProfileSelectContentView(
             'content_categories': consts.CONTENT_CATEGORIES,
         })
 
+    def save_selection(self, model, **owner):
+        """
+        Makes the `model` rows belonging to `owner` match the selected items.
+        Current and selected items are compared as pk sets per content type,
+        additions are inserted with one bulk insert and removals deleted
+        with one query per content type, all in one transaction.
+        """
+        content_types = ContentType.objects.get_for_models(
+            *(qs.model for qs in self.qs_dict.values())
+        )
+
+        with transaction.atomic(), signals.batched_updates():
+            added = []
+            for content_type, form in self.form_dict.items():
+                ct = content_types[self.qs_dict[content_type].model]
+                # set_qs_and_initial loaded the current pks
+                current = set(self.initial_dict[content_type])
+                # the field already evaluated the selection while validating
+                selected = [item.pk for item in form.cleaned_data['model_choice']]
+                added += [
+                    model(content_type=ct, object_id=pk, **owner)
+                    for pk in selected if pk not in current
+                ]
+                removed = current.difference(selected)
+                if removed:
+                    model.objects.filter(
+                        content_type=ct, object_id__in=removed, **owner
+                    ).delete()
+            if added:
+                bulk_create_ordered(model, added)
+                # bulk_create sends no post_save
+                signals.bump_versions(pk=self.profile.pk)
+                for row in added:
+                    signals.refresh_usage(row.content_type_id, [row.object_id])
+
     def post(self, request, profile_pk, *args, **kwargs):
         self.set_forms(data=request.POST)
         if all(form.is_valid() for form in self.form_dict.values()):
             if self.content:
                 # attach selected items to a profile content
-                for content_type, form in self.form_dict.items():
-                    models_in_form = form.cleaned_data['model_choice']
-                    initial_models = self.initial_dict[content_type]
-                    for mod in self.qs_dict[content_type]:
-                        if models_in_form.contains(mod) and not initial_models.contains(mod):
-                            # add new linked content
-                            lc = models.ContentContent(
-                                content=self.content,
-                                item=mod,
-                            )
-                            lc.save()
-                        elif not models_in_form.contains(mod) and initial_models.contains(mod):
-                            # remove previous linked content
-                            content_to_remove = mod.subcontent_related.get(content=self.content)
-                            content_to_remove.delete()
-                        else:
-                            pass
-                return redirect('profile', profile_pk)
+                self.save_selection(models.ContentContent, content=self.content)
             else:
-                # add the item as a profile content
-                for content_type, form in self.form_dict.items():
-                    models_in_form = form.cleaned_data['model_choice']
-                    initial_models = self.initial_dict[content_type]
-                    for mod in self.qs_dict[content_type]:
-                        if models_in_form.contains(mod) and not initial_models.contains(mod):
-                            # add new content
-                            c = models.Content(
-                                profile=self.profile,
-                                item=mod,
-                            )
-                            c.save()
-                        elif not models_in_form.contains(mod) and initial_models.contains(mod):
-                            # remove previous content
-                            content_to_remove = mod.content_related.get(profile=self.profile)
-                            content_to_remove.delete()
-                        else:
-                            pass
-                return redirect('profile', profile_pk)
+                # add the items as profile contents
+                self.save_selection(models.Content, profile=self.profile)
+            return redirect('profile', profile_pk)
         return self.render_to_response({
             'section': 'profiles',
             'forms': self.form_dict.values(),
@@ -664,30 +779,63 @@ class ProfileSelectContentView(
 
 
 class ContentOrderView(
+    LoginRequiredMixin,
     CsrfExemptMixin,
     JsonRequestResponseMixin,
     View,
 ):
+    # json key -> (model, lookup to the owning user, lookup to the profile)
+    order_models = {
+        'content': (models.Content, 'profile__user', 'profile'),
+        'attachments': (models.ContentContent, 'content__profile__user', 'content__profile'),
+    }
+
     def post(self, request):
-        order_field = self.request_json.keys()
-        if len(order_field) == 1:
-            if list(order_field)[0] == 'content':
-                for content_pk, order in self.request_json['content'].items():
-                    models.Content.objects.filter(
-                        pk=content_pk,
-                        profile__user=request.user,
-                    ).update(order=order)
-            elif list(order_field)[0] == 'attachments':
-                for attachment_pk, order in self.request_json['attachments'].items():
-                    models.ContentContent.objects.filter(
-                        pk=attachment_pk,
-                        content__profile__user=request.user,
-                    ).update(order=order)
+        """
+        Saves {"content" | "attachments": {pk: order, ...}} with one ownership
+        query and one UPDATE. Bodies of any other shape, or with pks or orders
+        that aren't integers, are a bad request. Pks with a negative order or
+        not owned by the user are skipped and returned in "rejected".
+        """
+        if not isinstance(self.request_json, dict) or len(self.request_json) != 1:
+            return self.render_bad_request_response()
+        order_field, orders = list(self.request_json.items())[0]
+        if order_field not in self.order_models or not isinstance(orders, dict):
+            return self.render_bad_request_response()
+        model, user_lookup, profile_lookup = self.order_models[order_field]
+
+        new_orders = dict()
+        rejected = []
+        for pk, order in orders.items():
+            # json object keys are always strings
+            try:
+                pk = int(pk)
+            except ValueError:
+                return self.render_bad_request_response()
+            if not isinstance(order, int) or isinstance(order, bool):
+                return self.render_bad_request_response()
+            if order < 0:
+                rejected.append(pk)
             else:
-                return None
-            return self.render_json_response({'saved': 'OK'})
-        else:
-            return None
+                new_orders[pk] = order
+
+        with transaction.atomic():
+            owned = dict(
+                model.objects
+                .filter(pk__in=new_orders, **{user_lookup: request.user})
+                .values_list('pk', profile_lookup)
+            )
+            if owned:
+                model.objects.filter(pk__in=owned).update(
+                    order=Case(
+                        *[When(pk=pk, then=Value(new_orders[pk])) for pk in owned],
+                        output_field=model._meta.get_field('order'),
+                    ),
+                )
+                # update() skips the signals that keep profile versions current
+                models.Profile.bump_versions(pk__in=set(owned.values()))
+        rejected += [pk for pk in new_orders if pk not in owned]
+        return self.render_json_response({'saved': 'OK', 'rejected': rejected})
 
 
 class ProfileCreateLink(
@@ -769,19 +917,10 @@ class ProfileLinkDetail(
         return super().dispatch(request, *args, **kwargs)
 
     def get_context_data(self, **kwargs):
-        qr_svg = None
-        if not self.object.is_expired:
-            qr = qrcode.QRCode(
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                image_factory=qrcode.image.svg.SvgPathImage
-            )
-            qr.add_data(self.object.get_shareable_url())
-            qr_svg = qr.make_image()
         context = super().get_context_data(**kwargs)
         context.update({
             'section': 'profiles',
             'profile_pk': self.profile_pk,
-            'qr_svg': qr_svg.to_string(encoding='unicode'),
         })
         return context
 
@@ -821,22 +960,95 @@ def share(request, profile_pk, link_pk=None):
             elif link.count() >= 1:
                 link = link.first()
 
-    qr = qrcode.QRCode(
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        image_factory=qrcode.image.svg.SvgPathImage
-    )
-    qr.add_data(link.get_shareable_url())
-    qr_svg = qr.make_image()
     return render(
         request,
         'profile/partials/share_profile.html',
         {
-            'qr_svg': qr_svg.to_string(encoding='unicode'),
             'link': link,
         },
     )
 
 
+def link_qr(request, uid, kind):
+    """qr code image of an active link's shareable url"""
+    link = models.ProfileLink.resolve(uid)
+    if link is None:
+        raise Http404('Link does not exist')
+    key, image = qr.get_qr(link.get_shareable_url(), kind)
+    # content addressed so the etag is strong and the image never changes
+    etag = f'"{key}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(image, content_type=qr.CONTENT_TYPES[kind])
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=consts.QR_CODE_MAX_AGE, immutable=True)
+    return response
+
+
+def vcard_response(profile) -> HttpResponse:
+    response = HttpResponse(
+        vcard.profile_to_vcard(profile, vcard.vcard_items(profile)),
+        content_type=consts.VCARD_CONTENT_TYPE,
+    )
+    response['Content-Disposition'] = f'attachment; filename="{slugify(profile.fn) or "contact"}.vcf"'
+    return response
+
+
+@login_required
+def profile_vcard(request, profile_pk):
+    profile = get_object_or_404(
+        models.Profile,
+        user=request.user,
+        pk=profile_pk,
+    )
+    return vcard_response(profile)
+
+
+def shared_profile_vcard(request, uid):
+    link = models.ProfileLink.resolve(uid)
+    if link is None:
+        raise Http404('Link does not exist')
+    count_shared_view(request, link)
+    return vcard_response(link.profile)
+
+
+@login_required
+def connections_vcard(request):
+    """
+    Streams a vcard for every profile connected to the user's profiles.
+    Profiles are read in chunks with their vcard items prefetched per
+    chunk, so memory doesn't grow with the number of connections.
+    """
+    content_types = ContentType.objects.get_for_models(*(
+        apps.get_model(app_label='profile', model_name=model_name)
+        for model_name in vcard.VCARD_ITEM_MODELS
+    )).values()
+    profiles = (
+        models.Profile.objects
+        .filter(rel_to_set__profile_from__user=request.user)
+        .exclude(user=request.user)
+        .distinct()
+        .order_by('pk')
+        .prefetch_related(
+            Prefetch(
+                'contents',
+                queryset=models.Content.objects.filter(
+                    content_type__in=content_types,
+                ).prefetch_related(GenericPrefetch('item', vcard.vcard_item_querysets())),
+                to_attr='vcard_contents',
+            )
+        )
+    )
+
+    def cards():
+        for profile in profiles.iterator(chunk_size=consts.VCARD_EXPORT_CHUNK_SIZE):
+            yield vcard.profile_to_vcard(profile, vcard.vcard_items(profile))
+
+    response = StreamingHttpResponse(cards(), content_type=consts.VCARD_CONTENT_TYPE)
+    response['Content-Disposition'] = 'attachment; filename="connections.vcf"'
+    return response
+
+
 @login_required
 @require_POST
 def profile_link_delete(request, link_uid, profile_pk=None):
@@ -852,6 +1064,37 @@ def profile_link_delete(request, link_uid, profile_pk=None):
         return redirect('profile_list')
 
 
+def count_shared_view(request, link):
+    """records a view of a shared link once per session, views by the profile's user aren't counted"""
+    if request.user.pk == link.profile.user_id:
+        return
+    # store shared with links in the session to prevent duplicated view counts
+    shared_with = request.session.get('shared_with', [])
+    if str(link.pk) not in shared_with:
+        request.session['shared_with'] = [*shared_with, str(link.pk)]
+        link.record_view()
+
+
+def shared_profile_json(request, uid):
+    """
+    The shared profile and its ordered contents as compact json for clients
+    that don't render shared.html, see serializers.profile_payload.
+    Supports sparse fieldsets, e.g. ?fields[profile]=fn,photo&fields[email]=email_address.
+    """
+    link = models.ProfileLink.resolve(uid)
+    if link is None:
+        raise Http404('Link does not exist')
+    count_shared_view(request, link)
+    profile = link.profile
+    fieldsets = serializers.parse_fieldsets(request.GET)
+    key = serializers.payload_key(profile, fieldsets)
+    etag = f'"{hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()}"'
+    return conditional_page(request, etag, lambda: HttpResponse(
+        serializers.encoded_payload(profile, fieldsets),
+        content_type='application/json',
+    ))
+
+
 class SharedProfileView(
     View,
     TemplateResponseMixin,
@@ -864,28 +1107,12 @@ class SharedProfileView(
     can_request: bool
 
     def dispatch(self, request, *args, **kwargs):
-        qs = (
-            models.ProfileLink.objects
-            .filter(Q(expires__isnull=True) | Q(expires__gte=now()))
-            .filter(Q(max_views__isnull=True) | Q(max_views__gt=F('views')))
-        )
-        try:
-            self.shared_link = qs.get(
-                uid=kwargs.get('uid'),
-            )
-        except models.ProfileLink.DoesNotExist or models.ProfileLink.MultipleObjectsReturned:
+        self.shared_link = models.ProfileLink.resolve(kwargs.get('uid'))
+        if self.shared_link is None:
             return render(request, 'profile/dne.html')
         else:
             self.user = request.user
-            # don't count views of profile's user
-            if not self.user == self.shared_link.profile.user:
-                # store shared with links in cookies to prevent duplicated view counts
-                shared_with = request.session.get('shared_with')
-                if not shared_with:
-                    request.session['shared_with'] = []
-                if str(self.shared_link.pk) not in request.session['shared_with']:
-                    request.session['shared_with'].append(str(self.shared_link.pk))
-                    self.shared_link.record_view()
+            count_shared_view(request, self.shared_link)
             self.set_request_to_from()
         return super().dispatch(request, *args, **kwargs)
 
@@ -904,14 +1131,38 @@ class SharedProfileView(
             ).first()
         self.can_request = not (self.request_to or self.request_from)
 
+    def get_mutual(self):
+        if self.user.pk == self.shared_link.profile.user_id:
+            return models.Profile.objects.none()
+        return graph.mutual_connections(self.user, self.shared_link.profile)
+
+    def get_etag(self, mutual):
+        """
+        The shared profile's version, the requests either way and the
+        versions of the mutual connections and of the viewer's profiles,
+        which the connect form lists. Views are counted in dispatch, so
+        a 304 still counts.
+        """
+        profile = self.shared_link.profile
+        shown = mutual
+        if self.user.is_authenticated:
+            shown = shown | models.Profile.objects.filter(user=self.user)
+        return page_etag(
+            self.request, 'shared', profile.pk, profile.version, self.shared_link.uid,
+            [(r.pk, r.status) if r else None for r in (self.request_to, self.request_from)],
+            sorted(shown.values_list('pk', 'version')),
+        )
+
     def get(self, request, *args, **kwargs):
-        form = self.get_form()
-        return self.render_to_response({
+        mutual = self.get_mutual()
+        return conditional_page(request, self.get_etag(mutual), lambda: self.render_to_response({
             'profile': self.shared_link.profile,
-            'form': form,
+            'form': self.get_form(),
             'request_to': self.request_to,
             'request_from': self.request_from,
-        })
+            'mutual': mutual,
+            'shared_link': self.shared_link,
+        }))
 
     def post(self, request, *args, **kwargs):
         if self.can_request:
@@ -929,6 +1180,8 @@ class SharedProfileView(
                 'form': form,
                 'request_to': self.request_to,
                 'request_from': self.request_from,
+                'mutual': self.get_mutual(),
+                'shared_link': self.shared_link,
             })
         else:
             return HttpResponseNotAllowed
@@ -945,19 +1198,39 @@ class SharedProfileView(
             return None
 
 
+# the profile columns the connection and request rows show
+ROW_PROFILE_FIELDS = (
+    'id', 'prefix', 'first_name', 'middle_name', 'last_name', 'suffix', 'headline', 'photo',
+)
+
+
+def row_profile_only(relation: str, *fields) -> list[str]:
+    return [*fields, relation, *(f'{relation}__{field}' for field in ROW_PROFILE_FIELDS)]
+
+
 class ConnectionListView(
     LoginRequiredMixin,
     generic.TemplateView,
 ):
     template_name = 'profile/user/connection_list.html'
+    rows_template_name = 'profile/user/partials/connection_rows.html'
     connections = None
     connection_requests = None
 
     def get(self, request, *args, **kwargs):
-        self.connections = models.Connection.objects.filter(profile_from__user=request.user)
+        self.connections = KeysetPage(
+            models.Connection.objects.filter(
+                profile_from__user=request.user,
+            ).select_related('profile_to').only(*row_profile_only('profile_to', 'created')),
+            'created',
+            cursor=request.GET.get('after'),
+        )
+        if request.headers.get('HX-Request'):
+            # infinite scroll, only the next rows
+            return render(request, self.rows_template_name, {'connections': self.connections})
         self.outstanding = models.ConnectionRequest.outstanding.filter(
             profile_to__user=request.user
-        )
+        ).select_related('profile_from').only(*row_profile_only('profile_from', 'message', 'requested'))
         return super().get(request, *args, **kwargs)
 
     def get_context_data(self, **kwargs):
@@ -966,6 +1239,7 @@ class ConnectionListView(
             'section': 'connections',
             'connections': self.connections,
             'outstanding': self.outstanding,
+            'suggestions': graph.suggestions(self.request.user),
         })
         return context
 
@@ -975,10 +1249,22 @@ class DeclinedListView(
     generic.ListView,
 ):
     template_name = 'profile/user/declined_list.html'
+    rows_template_name = 'profile/user/partials/declined_rows.html'
     context_object_name = 'declined'
 
+    def get_template_names(self):
+        if self.request.headers.get('HX-Request'):
+            return [self.rows_template_name]
+        return super().get_template_names()
+
     def get_queryset(self):
-        return models.ConnectionRequest.declined.filter(profile_to__user=self.request.user)
+        return KeysetPage(
+            models.ConnectionRequest.declined.filter(
+                profile_to__user=self.request.user,
+            ).select_related('profile_from').only(*row_profile_only('profile_from', 'message', 'requested')),
+            'requested',
+            cursor=self.request.GET.get('after'),
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -1029,18 +1315,24 @@ def connection_decline(request, request_pk):
 @login_required
 def connection(request, connection_pk):
     conn = get_object_or_404(
-        models.Connection,
+        models.Connection.objects.select_related('profile_to'),
         pk=connection_pk,
         profile_from__user=request.user,
     )
-    return render(
+    mutual = graph.mutual_connections(request.user, conn.profile_to)
+    etag = page_etag(
+        request, 'connection', conn.profile_to.pk, conn.profile_to.version,
+        sorted(mutual.values_list('pk', 'version')),
+    )
+    return conditional_page(request, etag, lambda: render(
         request,
         'profile/shared.html',
         {
             'section': 'connections',
             'profile': conn.profile_to,
+            'mutual': mutual,
         }
-    )
+    ))
 
 
 # class RegisterWizard(SessionWizardView):